@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
+from functools import lru_cache
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import json
+import hashlib
 from io import BytesIO
 import tempfile
 import os
@@ -31,11 +34,30 @@ def get_active_rooms():
 # Database path
 DB_PATH = 'work_tracker.db'
 
-# Database setup
-def init_db():
+def get_connection():
+    """Open a database connection with the per-connection PRAGMAs applied"""
     conn = sqlite3.connect(DB_PATH)
+    # NORMAL is crash-safe under WAL (set in init_db); keep sort/temp tables in memory
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+def db_file_identity():
+    """(path, inode) of the database file - changes if the file is deleted or replaced"""
+    try:
+        return DB_PATH, os.stat(DB_PATH).st_ino
+    except FileNotFoundError:
+        return DB_PATH, None
+
+# Database setup - schema, migrations and seed rows only need to run once per database file
+@st.cache_resource(show_spinner=False)
+def init_db(db_identity):
+    conn = get_connection()
     c = conn.cursor()
     
+    # Write-ahead logging is stored in the database file, so this only changes it once
+    c.execute("PRAGMA journal_mode = WAL")
+    
     # Main activities table
     c.execute('''
         CREATE TABLE IF NOT EXISTS activities (
@@ -113,6 +135,11 @@ def init_db():
         )
     ''')
 
+    # Migration: Add description to activity types created before it existed
+    c.execute("PRAGMA table_info(activity_types)")
+    if 'description' not in [col[1] for col in c.fetchall()]:
+        c.execute("ALTER TABLE activity_types ADD COLUMN description TEXT")
+
     # Migration: Add room columns if they don't exist
     c.execute("PRAGMA table_info(activities)")
     columns = [col[1] for col in c.fetchall()]
@@ -268,6 +295,10 @@ def init_db():
         )
     ''')
     
+    # Active-flag indexes for the settings tables (counts and active_only reads)
+    for table in ("personnel", "equipment", "courses", "activity_types", "leave_types", "room_numbers"):
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_active ON {table}(active)")
+    
     # Initialize default rooms if table is empty
     c.execute("SELECT COUNT(*) FROM room_numbers")
     if c.fetchone()[0] == 0:
@@ -283,7 +314,7 @@ def init_db():
 
 def add_cancellation(date, course, scheduled_time, scheduled_duration, reason, notes, impacted_students, rescheduled, reschedule_date, created_by, activity_id=None, tech_time_spent=0, activity_type=None, personnel=None, equipment=None, room_number=None):
     """Add a course cancellation record"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute('''
         INSERT INTO cancellations (activity_id, date, course, scheduled_time, scheduled_duration, reason, notes, 
@@ -295,10 +326,11 @@ def add_cancellation(date, course, scheduled_time, scheduled_duration, reason, n
           activity_type, personnel, equipment, room_number, created_by))
     conn.commit()
     conn.close()
+    clear_read_caches()
 
 def cancel_existing_activity(activity_id, reason, notes, tech_time_spent, rescheduled, reschedule_date, created_by):
     """Cancel an existing activity and create cancellation record"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     
     # Get activity details
@@ -324,6 +356,7 @@ def cancel_existing_activity(activity_id, reason, notes, tech_time_spent, resche
         
         conn.commit()
         conn.close()
+        clear_read_caches()
         return True
     
     conn.close()
@@ -331,7 +364,7 @@ def cancel_existing_activity(activity_id, reason, notes, tech_time_spent, resche
 
 def get_active_activities_for_cancellation(start_date, end_date):
     """Get activities that can be cancelled (not already cancelled)"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     query = """
         SELECT * FROM activities
         WHERE date BETWEEN ? AND ?
@@ -342,20 +375,21 @@ def get_active_activities_for_cancellation(start_date, end_date):
     conn.close()
     return df
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_cancellations(start_date=None, end_date=None):
     """Get cancellation records, optionally filtered by date range"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     if start_date and end_date:
         query = "SELECT * FROM cancellations WHERE date BETWEEN ? AND ? ORDER BY date DESC"
-        df = pd.read_sql_query(query, conn, params=(start_date, end_date))
+        df = pd.read_sql_query(query, conn, params=(start_date, end_date), parse_dates=['date'])
     else:
-        df = pd.read_sql_query("SELECT * FROM cancellations ORDER BY date DESC", conn)
+        df = pd.read_sql_query("SELECT * FROM cancellations ORDER BY date DESC", conn, parse_dates=['date'])
     conn.close()
     return df
 
 def update_cancellation(cancellation_id, **kwargs):
     """Update a cancellation record"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     
     set_clause = ", ".join([f"{k} = ?" for k in kwargs.keys()])
@@ -364,14 +398,16 @@ def update_cancellation(cancellation_id, **kwargs):
     c.execute(f"UPDATE cancellations SET {set_clause} WHERE id = ?", values)
     conn.commit()
     conn.close()
+    clear_read_caches()
 
 def delete_cancellation(cancellation_id):
     """Delete a cancellation record"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute("DELETE FROM cancellations WHERE id = ?", (cancellation_id,))
     conn.commit()
     conn.close()
+    clear_read_caches()
 
 #############################################
 # TIME OFF TRACKING FUNCTIONS (NEW!)
@@ -383,7 +419,7 @@ def add_time_off(personnel, start_date, end_date, time_off_type, hours, status,
     success, remaining = deduct_leave_hours(personnel, time_off_type, hours)
     
     # Add time off record regardless (for audit trail)
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute('''
         INSERT INTO time_off (personnel, start_date, end_date, time_off_type, hours, status, notes)
@@ -391,12 +427,14 @@ def add_time_off(personnel, start_date, end_date, time_off_type, hours, status,
     ''', (personnel, start_date, end_date, time_off_type, hours, status, notes))
     conn.commit()
     conn.close()
+    clear_read_caches()
     
     return success, remaining
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_time_off(start_date=None, end_date=None, personnel=None):
     """Get time off records, optionally filtered"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     
     query = "SELECT * FROM time_off WHERE 1=1"
     params = []
@@ -412,16 +450,26 @@ def get_time_off(start_date=None, end_date=None, personnel=None):
     query += " ORDER BY start_date DESC"
     
     if params:
-        df = pd.read_sql_query(query, conn, params=params)
+        df = pd.read_sql_query(query, conn, params=params, parse_dates=['start_date', 'end_date'])
     else:
-        df = pd.read_sql_query(query, conn)
+        df = pd.read_sql_query(query, conn, parse_dates=['start_date', 'end_date'])
     
     conn.close()
     return df
 
+def get_time_off_by_id(time_off_id):
+    """Get a single time off record as a dict, or None if it doesn't exist"""
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM time_off WHERE id = ?", (time_off_id,))
+    record = c.fetchone()
+    conn.close()
+    return dict(record) if record else None
+
 def update_time_off(time_off_id, **kwargs):
     """Update a time off record and adjust leave balances if leave type changes"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     
     # Get original record to check if leave type is changing
@@ -459,10 +507,11 @@ def update_time_off(time_off_id, **kwargs):
     c.execute(f"UPDATE time_off SET {set_clause} WHERE id = ?", values)
     conn.commit()
     conn.close()
+    clear_read_caches()
 
 def delete_time_off(time_off_id):
     """Delete a time off record and restore leave balance"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     
     # Get the record details before deleting
@@ -485,10 +534,12 @@ def delete_time_off(time_off_id):
     c.execute("DELETE FROM time_off WHERE id = ?", (time_off_id,))
     conn.commit()
     conn.close()
+    clear_read_caches()
 
+@st.cache_data(ttl=300, show_spinner=False)
 def get_time_off_summary(year=None):
     """Get summary of time off by personnel"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     
     if year:
         query = """
@@ -521,9 +572,10 @@ def get_time_off_summary(year=None):
 # LEAVE ACCRUAL MANAGEMENT FUNCTIONS (NEW!)
 #############################################
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_leave_types(active_only=True):
     """Get all leave types"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     if active_only:
         df = pd.read_sql_query("SELECT * FROM leave_types WHERE active = 1 ORDER BY leave_type_name", conn)
     else:
@@ -533,39 +585,23 @@ def get_leave_types(active_only=True):
 
 def add_leave_type(leave_type_name, default_annual_hours):
     """Add a new leave type"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     try:
         c.execute("INSERT INTO leave_types (leave_type_name, default_annual_hours) VALUES (?, ?)", 
                   (leave_type_name, default_annual_hours))
         conn.commit()
         conn.close()
+        clear_read_caches()
         return True
     except sqlite3.IntegrityError:
         conn.close()
         return False
 
-def update_leave_type(leave_type_id, **kwargs):
-    """Update a leave type"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    set_clause = ", ".join([f"{k} = ?" for k in kwargs.keys()])
-    values = list(kwargs.values()) + [leave_type_id]
-    c.execute(f"UPDATE leave_types SET {set_clause} WHERE id = ?", values)
-    conn.commit()
-    conn.close()
-
-def delete_leave_type(leave_type_id):
-    """Deactivate a leave type (don't delete - preserve history)"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("UPDATE leave_types SET active = 0 WHERE id = ?", (leave_type_id,))
-    conn.commit()
-    conn.close()
-
+@st.cache_data(ttl=60, show_spinner=False)
 def get_leave_accruals(personnel=None):
     """Get leave accruals for a person or all personnel"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     if personnel:
         df = pd.read_sql_query(
             "SELECT * FROM leave_accruals WHERE personnel = ? ORDER BY leave_type", 
@@ -577,7 +613,7 @@ def get_leave_accruals(personnel=None):
 
 def initialize_leave_accruals(personnel):
     """Initialize leave accruals for a new person - starts at 0 hours for full control"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     
     # Get active leave types
@@ -585,18 +621,18 @@ def initialize_leave_accruals(personnel):
     leave_types = c.fetchall()
     
     # Insert accruals for each leave type starting at 0 hours
-    for (leave_type,) in leave_types:
-        c.execute('''
-            INSERT OR IGNORE INTO leave_accruals (personnel, leave_type, hours_available, hours_used)
-            VALUES (?, ?, 0, 0)
-        ''', (personnel, leave_type))
+    c.executemany('''
+        INSERT OR IGNORE INTO leave_accruals (personnel, leave_type, hours_available, hours_used)
+        VALUES (?, ?, 0, 0)
+    ''', [(personnel, leave_type) for (leave_type,) in leave_types])
     
     conn.commit()
     conn.close()
+    clear_read_caches()
 
 def add_accrual_hours(personnel, leave_type, hours, reason=None):
     """Add accrual hours to a person's leave balance"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     
     # Check if accrual exists
@@ -619,11 +655,12 @@ def add_accrual_hours(personnel, leave_type, hours, reason=None):
     
     conn.commit()
     conn.close()
+    clear_read_caches()
     return True
 
 def set_accrual_balance(personnel, leave_type, exact_hours):
     """Set exact balance amount (not add/subtract, but SET to specific amount)"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     
     # Check if accrual exists
@@ -647,11 +684,12 @@ def set_accrual_balance(personnel, leave_type, exact_hours):
     
     conn.commit()
     conn.close()
+    clear_read_caches()
     return True
 
 def deduct_leave_hours(personnel, leave_type, hours):
     """Deduct hours from leave balance (called when logging time off)"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     
     # Get current balance
@@ -671,6 +709,7 @@ def deduct_leave_hours(personnel, leave_type, hours):
             """, (new_available, new_used, personnel, leave_type))
             conn.commit()
             conn.close()
+            clear_read_caches()
             return True, new_available
         else:
             conn.close()
@@ -683,11 +722,13 @@ def deduct_leave_hours(personnel, leave_type, hours):
         """, (personnel, leave_type, hours))
         conn.commit()
         conn.close()
+        clear_read_caches()
         return False, 0
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_leave_balance_summary(personnel):
     """Get summary of all leave balances for a person"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     query = """
         SELECT la.leave_type, 
                la.hours_available, 
@@ -706,9 +747,10 @@ def get_leave_balance_summary(personnel):
 # ROOM MANAGEMENT FUNCTIONS (NEW!)
 #############################################
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_room_numbers(active_only=True):
     """Get all room numbers"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     if active_only:
         df = pd.read_sql_query("SELECT * FROM room_numbers WHERE active = 1 ORDER BY room_number", conn)
     else:
@@ -718,12 +760,13 @@ def get_room_numbers(active_only=True):
 
 def add_room_number(room_number, notes=None):
     """Add a new room"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     try:
         c.execute("INSERT INTO room_numbers (room_number, notes) VALUES (?, ?)", (room_number, notes))
         conn.commit()
         conn.close()
+        clear_read_caches()
         return True
     except sqlite3.IntegrityError:
         conn.close()
@@ -731,25 +774,18 @@ def add_room_number(room_number, notes=None):
 
 def update_room_number(room_id, **kwargs):
     """Update room details"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     set_clause = ", ".join([f"{k} = ?" for k in kwargs.keys()])
     values = list(kwargs.values()) + [room_id]
     c.execute(f"UPDATE room_numbers SET {set_clause} WHERE id = ?", values)
     conn.commit()
     conn.close()
-
-def toggle_room_active(room_id):
-    """Toggle room active status"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("UPDATE room_numbers SET active = NOT active WHERE id = ?", (room_id,))
-    conn.commit()
-    conn.close()
+    clear_read_caches()
 
 # Equipment management functions
 def add_equipment(name, serial_number, purchase_date, status, location, notes):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute('''
         INSERT INTO equipment (name, serial_number, purchase_date, status, location, notes)
@@ -757,10 +793,11 @@ def add_equipment(name, serial_number, purchase_date, status, location, notes):
     ''', (name, serial_number, purchase_date, status, location, notes))
     conn.commit()
     conn.close()
+    clear_read_caches()
 
 # Database operations
 def add_activity(date, activity_type, hours, students_trained, personnel, equipment, course, room_number, time_start, time_end, turn_in, received, notes):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute('''
         INSERT INTO activities (date, activity_type, hours, students_trained, personnel, equipment, course, room_number, time_start, time_end, turn_in, received, notes)
@@ -770,7 +807,7 @@ def add_activity(date, activity_type, hours, students_trained, personnel, equipm
     conn.close()
 
 def get_activities(start_date=None, end_date=None):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     query = "SELECT * FROM activities"
     if start_date and end_date:
         query += f" WHERE date BETWEEN '{start_date}' AND '{end_date}'"
@@ -780,14 +817,14 @@ def get_activities(start_date=None, end_date=None):
     return df
 
 def delete_activity(activity_id):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute("DELETE FROM activities WHERE id = ?", (activity_id,))
     conn.commit()
     conn.close()
 
 def update_activity(activity_id, date, activity_type, hours, students_trained, personnel, equipment, course, room_number, time_start, time_end, turn_in, received, notes):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute('''
         UPDATE activities 
@@ -799,7 +836,7 @@ def update_activity(activity_id, date, activity_type, hours, students_trained, p
 
 # Personnel management
 def add_personnel(name, role):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     try:
         c.execute("INSERT INTO personnel (name, role) VALUES (?, ?)", (name, role))
@@ -808,10 +845,12 @@ def add_personnel(name, role):
     except sqlite3.IntegrityError:
         success = False
     conn.close()
+    clear_read_caches()
     return success
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_personnel(active_only=True):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     query = "SELECT * FROM personnel"
     if active_only:
         query += " WHERE active = 1"
@@ -820,16 +859,9 @@ def get_personnel(active_only=True):
     conn.close()
     return df
 
-def toggle_personnel(person_id, active):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("UPDATE personnel SET active = ? WHERE id = ?", (active, person_id))
-    conn.commit()
-    conn.close()
-
 # Equipment management
 def add_equipment(name, status, notes):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     try:
         c.execute("INSERT INTO equipment (name, status, notes) VALUES (?, ?, ?)", (name, status, notes))
@@ -838,10 +870,12 @@ def add_equipment(name, status, notes):
     except sqlite3.IntegrityError:
         success = False
     conn.close()
+    clear_read_caches()
     return success
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_equipment(active_only=True):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     query = "SELECT * FROM equipment"
     if active_only:
         query += " WHERE active = 1"
@@ -851,7 +885,7 @@ def get_equipment(active_only=True):
     return df
 
 def update_equipment_status(equipment_id, status, maintenance_date, notes):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute("""
         UPDATE equipment 
@@ -860,17 +894,11 @@ def update_equipment_status(equipment_id, status, maintenance_date, notes):
     """, (status, maintenance_date, notes, equipment_id))
     conn.commit()
     conn.close()
-
-def toggle_equipment(equipment_id, active):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("UPDATE equipment SET active = ? WHERE id = ?", (active, equipment_id))
-    conn.commit()
-    conn.close()
+    clear_read_caches()
 
 # Enhanced Course management with editing
 def add_course(name, description):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     try:
         c.execute("""
@@ -882,21 +910,12 @@ def add_course(name, description):
     except sqlite3.IntegrityError:
         success = False
     conn.close()
+    clear_read_caches()
     return success
 
-def update_course(course_id, name, description):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        UPDATE courses 
-        SET name=?, description=?
-        WHERE id=?
-    """, (name, description, course_id))
-    conn.commit()
-    conn.close()
-
+@st.cache_data(ttl=60, show_spinner=False)
 def get_courses(active_only=True):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     query = "SELECT * FROM courses"
     if active_only:
         query += " WHERE active = 1"
@@ -905,16 +924,9 @@ def get_courses(active_only=True):
     conn.close()
     return df
 
-def toggle_course(course_id, active):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("UPDATE courses SET active = ? WHERE id = ?", (active, course_id))
-    conn.commit()
-    conn.close()
-
 # Enhanced Activity type management with editing
 def add_activity_type(name, description):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     try:
         c.execute("INSERT INTO activity_types (name, description) VALUES (?, ?)", (name, description))
@@ -923,17 +935,12 @@ def add_activity_type(name, description):
     except sqlite3.IntegrityError:
         success = False
     conn.close()
+    clear_read_caches()
     return success
 
-def update_activity_type(type_id, name, description):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("UPDATE activity_types SET name=?, description=? WHERE id=?", (name, description, type_id))
-    conn.commit()
-    conn.close()
-
+@st.cache_data(ttl=60, show_spinner=False)
 def get_activity_types(active_only=True):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     query = "SELECT * FROM activity_types"
     if active_only:
         query += " WHERE active = 1"
@@ -942,16 +949,9 @@ def get_activity_types(active_only=True):
     conn.close()
     return df
 
-def toggle_activity_type(type_id, active):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("UPDATE activity_types SET active = ? WHERE id = ?", (active, type_id))
-    conn.commit()
-    conn.close()
-
 # Incident management
 def add_incident(date, incident_type, equipment, severity, description):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute("""
         INSERT INTO incidents (date, incident_type, equipment, severity, description)
@@ -959,9 +959,11 @@ def add_incident(date, incident_type, equipment, severity, description):
     """, (date, incident_type, equipment, severity, description))
     conn.commit()
     conn.close()
+    clear_read_caches()
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_incidents(resolved=None):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     query = "SELECT * FROM incidents"
     if resolved is not None:
         query += f" WHERE resolved = {resolved}"
@@ -970,20 +972,22 @@ def get_incidents(resolved=None):
     conn.close()
     return df
 
-def resolve_incident(incident_id, resolution):
-    conn = sqlite3.connect(DB_PATH)
+def resolve_incidents(resolutions):
+    """Mark incidents resolved from (incident_id, resolution) pairs in one transaction"""
+    conn = get_connection()
     c = conn.cursor()
-    c.execute("""
+    c.executemany("""
         UPDATE incidents 
         SET resolved = 1, resolution = ?
         WHERE id = ?
-    """, (resolution, incident_id))
+    """, [(resolution, incident_id) for incident_id, resolution in resolutions])
     conn.commit()
     conn.close()
+    clear_read_caches()
 
 # Goals management
 def add_goal(goal_type, target_value, period):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute("""
         INSERT INTO goals (goal_type, target_value, period)
@@ -991,26 +995,120 @@ def add_goal(goal_type, target_value, period):
     """, (goal_type, target_value, period))
     conn.commit()
     conn.close()
+    clear_read_caches()
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_goals():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT * FROM goals ORDER BY created_at DESC", conn)
+    conn = get_connection()
+    df = pd.read_sql_query("""
+        SELECT *,
+               CASE WHEN target_value > 0 THEN current_value * 100.0 / target_value ELSE 0 END as progress
+        FROM goals
+        ORDER BY created_at DESC
+    """, conn)
     conn.close()
     return df
 
-def update_goal_progress(goal_id, current_value):
-    conn = sqlite3.connect(DB_PATH)
+def delete_goal(goal_id):
+    conn = get_connection()
     c = conn.cursor()
-    c.execute("UPDATE goals SET current_value = ? WHERE id = ?", (current_value, goal_id))
+    c.execute("DELETE FROM goals WHERE id = ?", (goal_id,))
     conn.commit()
     conn.close()
+    clear_read_caches()
 
-def delete_goal(goal_id):
-    conn = sqlite3.connect(DB_PATH)
+# Active/inactive counts for settings tables
+@st.cache_data(ttl=60, show_spinner=False)
+def get_active_counts(table):
+    """{active: row count} for a settings table, counted in SQL"""
+    conn = get_connection()
     c = conn.cursor()
-    c.execute("DELETE FROM goals WHERE id = ?", (goal_id,))
-    conn.commit()
+    c.execute(f"SELECT active, COUNT(*) FROM {table} GROUP BY active")
+    counts = dict(c.fetchall())
+    conn.close()
+    return counts
+
+# Batched writes
+def bulk_apply(changes):
+    """Run queued (sql, params) writes grouped by statement in one transaction"""
+    grouped = {}
+    for sql, params in changes:
+        grouped.setdefault(sql, []).append(params)
+    
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        for sql, rows in grouped.items():
+            c.executemany(sql, rows)
+        conn.commit()
+        success = True
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        success = False
     conn.close()
+    clear_read_caches()
+    return success
+
+#############################################
+# CACHED READ HELPERS
+#############################################
+
+CACHED_READERS = (
+    get_cancellations, get_time_off, get_time_off_summary,
+    get_leave_types, get_leave_accruals, get_leave_balance_summary,
+    get_personnel, get_equipment, get_courses, get_activity_types,
+    get_room_numbers, get_incidents, get_goals, get_active_counts,
+)
+
+def clear_read_caches():
+    """Drop cached query results after any write to the database"""
+    for reader in CACHED_READERS:
+        reader.clear()
+    _sorted_personnel_names.clear()
+    _personnel_filter_options.clear()
+    _equipment_names.clear()
+    _equipment_options.clear()
+    _sorted_course_names.clear()
+    _cancellation_year_counts.clear()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _sorted_personnel_names():
+    """Sorted names of active personnel (get_personnel orders by name)"""
+    return get_personnel()['name'].tolist()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _equipment_names():
+    """Names of active equipment in name order (cleared by equipment writes)"""
+    return get_equipment()['name'].tolist()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _personnel_filter_options():
+    """("All",) followed by active personnel names, for person filter selectboxes"""
+    return ("All",) + tuple(_sorted_personnel_names())
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _equipment_options():
+    """("",) followed by active equipment names, for optional equipment selectboxes"""
+    return ("",) + tuple(_equipment_names())
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _sorted_course_names():
+    """Sorted names of active courses (cleared by course writes)"""
+    courses = get_courses()
+    return sorted(courses['name'].tolist()) if not courses.empty else []
+
+@lru_cache(maxsize=None)
+def _year_bounds(year):
+    """(Jan 1, Dec 31) dates bracketing a calendar year"""
+    return date(year, 1, 1), date(year, 12, 31)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cancellation_year_counts(year):
+    """(reason, count) pairs and Jan-Dec counts for one year of cancellations"""
+    year_cancellations = get_cancellations(*_year_bounds(year))
+    reason_counts = year_cancellations['reason'].value_counts()
+    monthly_counts = year_cancellations['date'].dt.month.value_counts().reindex(range(1, 13), fill_value=0).sort_index()
+    return tuple(reason_counts.items()), monthly_counts.to_numpy()
 
 #############################################
 # AI-POWERED FEATURES (PHASE 2)
@@ -1620,12 +1718,113 @@ Average Class Size: {(total_students / total_activities):.1f} students
     
     return pptx_io, None
 
+#############################################
+# CACHED CHART & EXPORT BUILDERS
+#############################################
+
+def _hash_dataframe(df):
+    """Content hash for DataFrames passed to cached builders"""
+    h = hashlib.blake2b(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    h.update(repr(df.columns.tolist()).encode())
+    return h.digest()
+
+DF_HASH_FUNCS = {pd.DataFrame: _hash_dataframe}
+
+@st.cache_data(ttl=300, max_entries=16, hash_funcs=DF_HASH_FUNCS, show_spinner=False)
+def df_to_csv(df):
+    """CSV bytes for a download button - only re-encoded when the data changes"""
+    return df.to_csv(index=False).encode('utf-8')
+
+@st.cache_data(ttl=300, max_entries=16, hash_funcs=DF_HASH_FUNCS, show_spinner=False)
+def equipment_timeline_fig(timeline_agg):
+    """Line chart of daily usage for the top equipment"""
+    fig = px.line(
+        timeline_agg,
+        x='Date',
+        y='Count',
+        color='Equipment',
+        markers=True,
+        labels={'Count': 'Times Used', 'Date': 'Date', 'Equipment': 'Equipment'}
+    )
+    fig.update_layout(height=400)
+    return fig
+
+@st.cache_data(ttl=300, max_entries=16, hash_funcs=DF_HASH_FUNCS, show_spinner=False)
+def equipment_heatmap_fig(pivot_monthly):
+    """Equipment x month usage heatmap"""
+    fig = px.imshow(
+        pivot_monthly,
+        labels=dict(x="Month", y="Equipment", color="Uses"),
+        color_continuous_scale=['white', '#F8B400', '#000000'],
+        aspect="auto"
+    )
+    fig.update_layout(height=500)
+    return fig
+
+@st.cache_data(ttl=300, max_entries=16, hash_funcs=DF_HASH_FUNCS, show_spinner=False)
+def equipment_dow_fig(dow_usage):
+    """Bar chart of equipment usage by day of week"""
+    fig = px.bar(
+        dow_usage,
+        x='DayOfWeek',
+        y='Uses',
+        labels={'DayOfWeek': 'Day of Week', 'Uses': 'Total Uses'},
+        color='DayOfWeek',
+        color_discrete_sequence=['#E74C3C', '#3498DB', '#27AE60', '#F8B400', '#9B59B6', '#17A2B8', '#E67E22']
+    )
+    fig.update_layout(showlegend=False, height=300)
+    return fig
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner=False)
+def cancellation_reason_fig(reason_items, year):
+    """Pie chart of a year's cancellations by reason, from (reason, count) pairs"""
+    reason_names, reason_values = zip(*reason_items)
+    return px.pie(
+        values=reason_values,
+        names=reason_names,
+        title=f"Cancellations by Reason ({year})",
+        color_discrete_sequence=['#F8B400', '#E74C3C', '#4A90E2', '#27AE60', '#9B59B6']
+    )
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner=False)
+def cancellation_monthly_fig(monthly_values, year):
+    """Bar chart of a year's cancellations per month"""
+    return px.bar(
+        x=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'],
+        y=monthly_values,
+        title=f"Monthly Cancellation Trend ({year})",
+        labels={'x': 'Month', 'y': 'Cancellations'},
+        color_discrete_sequence=['#F8B400']
+    )
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner=False)
+def time_off_person_fig(person_totals, year):
+    """Horizontal bar chart of time off hours per team member"""
+    return px.bar(
+        x=person_totals.values,
+        y=person_totals.index,
+        orientation='h',
+        title=f"Total Time Off Hours ({year})",
+        labels={'x': 'Hours', 'y': 'Team Member'},
+        color_discrete_sequence=['#F8B400']
+    )
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner=False)
+def time_off_type_fig(type_totals):
+    """Pie chart of time off hours by leave type"""
+    return px.pie(
+        values=type_totals.values,
+        names=type_totals.index,
+        title="Time Off by Type",
+        color_discrete_sequence=['#F8B400', '#4A90E2', '#27AE60', '#E67E22', '#9B59B6']
+    )
+
 #############################################
 # PDF REPORT GENERATION FUNCTIONS
 #############################################
 
 # Initialize database
-init_db()
+init_db(db_file_identity())
 
 # Custom CSS for VCU branding and mobile responsiveness
 st.markdown("""
@@ -1873,16 +2072,14 @@ if page == "📝 Data Entry":
         students_trained = st.number_input("Students Trained", min_value=0, step=1, value=0)
     
     with col2:
-        personnel_df = get_personnel()
-        personnel_list = personnel_df['name'].tolist() if not personnel_df.empty else []
+        personnel_list = _sorted_personnel_names()
         selected_personnel = st.multiselect("Personnel", personnel_list)
         
         courses_df = get_courses()
         course_list = [""] + courses_df['name'].tolist() if not courses_df.empty else [""]
         selected_course = st.selectbox("Course", course_list)
         
-        equipment_df = get_equipment()
-        equipment_list = equipment_df['name'].tolist() if not equipment_df.empty else []
+        equipment_list = _equipment_names()
         selected_equipment = st.multiselect("Equipment Used", equipment_list)
     
     # NEW: Room and Time fields
@@ -2515,10 +2712,9 @@ elif page == "👔 Executive Dashboard":
             col1, col3 = st.columns(2)
         
         with col1:
-            csv = export_df.to_csv(index=False)
             st.download_button(
                 label="📥 Download CSV",
-                data=csv,
+                data=lambda df=export_df: df_to_csv(df),
                 file_name=f"Executive_Summary_{period_name.replace(' ', '_')}.csv",
                 mime="text/csv",
                 use_container_width=True
@@ -2599,7 +2795,7 @@ elif page == "📚 Course Analytics":
             end_date = st.date_input("End", value=today, key="course_end")
     
     # Get course analytics data
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     
     if start_date and end_date:
         date_filter = f"AND date BETWEEN '{start_date}' AND '{end_date}'"
@@ -2713,24 +2909,24 @@ elif page == "📚 Course Analytics":
             with col1:
                 st.markdown("#### Most Hours Delivered")
                 top_hours = course_analytics.nlargest(5, 'total_hours')[['course', 'total_hours', 'session_count']]
-                for idx, row in top_hours.iterrows():
+                for row in top_hours.itertuples(index=False):
                     st.markdown(f"""
                     <div style='background: linear-gradient(135deg, #F8B400 0%, #000000 100%); 
                                 padding: 15px; border-radius: 10px; margin: 10px 0; color: white;'>
-                        <h4 style='margin:0; color: white;'>{row['course']}</h4>
-                        <p style='margin:5px 0;'>⏰ {row['total_hours']:.1f} hours • 📅 {int(row['session_count'])} sessions</p>
+                        <h4 style='margin:0; color: white;'>{row.course}</h4>
+                        <p style='margin:5px 0;'>⏰ {row.total_hours:.1f} hours • 📅 {int(row.session_count)} sessions</p>
                     </div>
                     """, unsafe_allow_html=True)
             
             with col2:
                 st.markdown("#### Most Frequently Run")
                 top_frequent = course_analytics.nlargest(5, 'session_count')[['course', 'session_count', 'avg_hours_per_session']]
-                for idx, row in top_frequent.iterrows():
+                for row in top_frequent.itertuples(index=False):
                     st.markdown(f"""
                     <div style='background: linear-gradient(135deg, #000000 0%, #F8B400 100%); 
                                 padding: 15px; border-radius: 10px; margin: 10px 0; color: white;'>
-                        <h4 style='margin:0; color: white;'>{row['course']}</h4>
-                        <p style='margin:5px 0;'>📅 {int(row['session_count'])} sessions • ⌛ {row['avg_hours_per_session']:.2f}h avg</p>
+                        <h4 style='margin:0; color: white;'>{row.course}</h4>
+                        <p style='margin:5px 0;'>📅 {int(row.session_count)} sessions • ⌛ {row.avg_hours_per_session:.2f}h avg</p>
                     </div>
                     """, unsafe_allow_html=True)
             
@@ -2744,23 +2940,23 @@ elif page == "📚 Course Analytics":
                 # Longest average sessions
                 longest_sessions = course_analytics.nlargest(3, 'avg_hours_per_session')[['course', 'avg_hours_per_session']]
                 st.markdown("**Longest Sessions**")
-                for idx, row in longest_sessions.iterrows():
-                    st.write(f"• {row['course']}: {row['avg_hours_per_session']:.2f}h")
+                for row in longest_sessions.itertuples(index=False):
+                    st.write(f"• {row.course}: {row.avg_hours_per_session:.2f}h")
             
             with col2:
                 # Most consistent courses (highest session count)
                 most_consistent = course_analytics.nlargest(3, 'session_count')[['course', 'session_count']]
                 st.markdown("**Most Consistent**")
-                for idx, row in most_consistent.iterrows():
-                    st.write(f"• {row['course']}: {int(row['session_count'])} runs")
+                for row in most_consistent.itertuples(index=False):
+                    st.write(f"• {row.course}: {int(row.session_count)} runs")
             
             with col3:
                 # FIXED: Convert to datetime first
                 course_analytics['last_session_dt'] = pd.to_datetime(course_analytics['last_session'])
                 recent = course_analytics.nlargest(3, 'last_session_dt')[['course', 'last_session']]
                 st.markdown("**Most Recent Activity**")
-                for idx, row in recent.iterrows():
-                    st.write(f"• {row['course']}: {row['last_session']}")
+                for row in recent.itertuples(index=False):
+                    st.write(f"• {row.course}: {row.last_session}")
         
         with tab3:
             st.markdown("### 📈 Course Activity Trends")
@@ -2876,10 +3072,9 @@ elif page == "📚 Course Analytics":
             st.dataframe(display_df, use_container_width=True, hide_index=True)
             
             # Download button
-            csv = display_df.to_csv(index=False)
             st.download_button(
                 label="📥 Download Course Analytics CSV",
-                data=csv,
+                data=lambda df=display_df: df_to_csv(df),
                 file_name=f"course_analytics_{datetime.now().strftime('%Y%m%d')}.csv",
                 mime="text/csv"
             )
@@ -2945,17 +3140,17 @@ elif page == "🔧 Equipment Analytics":
     equipment_hours = {}
     equipment_dates = {}
     
-    for idx, row in activities.iterrows():
-        if pd.notna(row['equipment']) and row['equipment']:
-            equipment_items = [e.strip() for e in row['equipment'].split(',')]
+    for row in activities.itertuples(index=False):
+        if pd.notna(row.equipment) and row.equipment:
+            equipment_items = [e.strip() for e in row.equipment.split(',')]
             for equipment in equipment_items:
                 if equipment:
                     equipment_usage[equipment] = equipment_usage.get(equipment, 0) + 1
-                    equipment_hours[equipment] = equipment_hours.get(equipment, 0) + row['hours']
+                    equipment_hours[equipment] = equipment_hours.get(equipment, 0) + row.hours
                     
                     if equipment not in equipment_dates:
                         equipment_dates[equipment] = []
-                    equipment_dates[equipment].append(row['date'])
+                    equipment_dates[equipment].append(row.date)
     
     if equipment_usage:
         # Create comprehensive analytics dataframe
@@ -2964,11 +3159,19 @@ elif page == "🔧 Equipment Analytics":
             'Usage Count': list(equipment_usage.values()),
             'Total Hours': [equipment_hours[e] for e in equipment_usage.keys()],
             'Avg Hours/Use': [equipment_hours[e]/equipment_usage[e] for e in equipment_usage.keys()],
-            'Last Used': [max(equipment_dates[e]) for e in equipment_usage.keys()]
+            'Last Used': pd.to_datetime([max(equipment_dates[e]) for e in equipment_usage.keys()])
         })
         
         equipment_analytics = equipment_analytics.sort_values('Usage Count', ascending=False)
         
+        # Rebuild in sorted order with one contiguous array per column for the repeated column reductions below
+        equipment_analytics = pd.DataFrame({
+            c: np.ascontiguousarray(equipment_analytics[c].to_numpy()) for c in equipment_analytics.columns
+        })
+        
+        # Already ranked by usage - one slice feeds every "top equipment" view below
+        top5 = equipment_analytics.head(5)
+        
         # Get equipment status information
         equipment_status_df = get_equipment()
         
@@ -3060,27 +3263,27 @@ elif page == "🔧 Equipment Analytics":
             
             with col1:
                 st.markdown("#### Most Frequently Used")
-                top_usage = equipment_analytics.nlargest(5, 'Usage Count')[['Equipment', 'Usage Count', 'Total Hours']]
-                for idx, row in top_usage.iterrows():
-                    st.markdown(f"""
-                    <div style='background: linear-gradient(135deg, #F8B400 0%, #000000 100%); 
-                                padding: 15px; border-radius: 10px; margin: 10px 0; color: white;'>
-                        <h4 style='margin:0; color: white;'>{row['Equipment']}</h4>
-                        <p style='margin:5px 0;'>🔄 {int(row['Usage Count'])} uses • ⏰ {row['Total Hours']:.1f} hours</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                top_usage = top5[['Equipment', 'Usage Count', 'Total Hours']]
+                st.markdown("".join(
+                    "<div style='background: linear-gradient(135deg, #F8B400 0%, #000000 100%); "
+                    "padding: 15px; border-radius: 10px; margin: 10px 0; color: white;'>"
+                    f"<h4 style='margin:0; color: white;'>{equipment}</h4>"
+                    f"<p style='margin:5px 0;'>🔄 {int(uses)} uses • ⏰ {hours:.1f} hours</p>"
+                    "</div>"
+                    for equipment, uses, hours in top_usage.itertuples(index=False, name=None)
+                ), unsafe_allow_html=True)
             
             with col2:
                 st.markdown("#### Longest Operating Hours")
                 top_hours = equipment_analytics.nlargest(5, 'Total Hours')[['Equipment', 'Total Hours', 'Usage Count']]
-                for idx, row in top_hours.iterrows():
-                    st.markdown(f"""
-                    <div style='background: linear-gradient(135deg, #000000 0%, #F8B400 100%); 
-                                padding: 15px; border-radius: 10px; margin: 10px 0; color: white;'>
-                        <h4 style='margin:0; color: white;'>{row['Equipment']}</h4>
-                        <p style='margin:5px 0;'>⏰ {row['Total Hours']:.1f} hours • 🔄 {int(row['Usage Count'])} uses</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                st.markdown("".join(
+                    "<div style='background: linear-gradient(135deg, #000000 0%, #F8B400 100%); "
+                    "padding: 15px; border-radius: 10px; margin: 10px 0; color: white;'>"
+                    f"<h4 style='margin:0; color: white;'>{equipment}</h4>"
+                    f"<p style='margin:5px 0;'>⏰ {hours:.1f} hours • 🔄 {int(uses)} uses</p>"
+                    "</div>"
+                    for equipment, hours, uses in top_hours.itertuples(index=False, name=None)
+                ), unsafe_allow_html=True)
             
             st.markdown("---")
             
@@ -3090,10 +3293,11 @@ elif page == "🔧 Equipment Analytics":
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                st.markdown("**Average Session Length**")
                 longest_sessions = equipment_analytics.nlargest(3, 'Avg Hours/Use')[['Equipment', 'Avg Hours/Use']]
-                for idx, row in longest_sessions.iterrows():
-                    st.write(f"• {row['Equipment']}: {row['Avg Hours/Use']:.2f}h")
+                st.markdown("**Average Session Length**\n\n" + "\n".join(
+                    f"- {equipment}: {avg_hours:.2f}h"
+                    for equipment, avg_hours in longest_sessions.itertuples(index=False, name=None)
+                ))
             
             with col2:
                 # Calculate utilization rate (uses per day in period)
@@ -3104,17 +3308,17 @@ elif page == "🔧 Equipment Analytics":
                 
                 equipment_analytics['Uses Per Day'] = equipment_analytics['Usage Count'] / days_in_period
                 high_utilization = equipment_analytics.nlargest(3, 'Uses Per Day')[['Equipment', 'Uses Per Day']]
-                st.markdown("**Highest Utilization Rate**")
-                for idx, row in high_utilization.iterrows():
-                    st.write(f"• {row['Equipment']}: {row['Uses Per Day']:.3f}/day")
+                st.markdown("**Highest Utilization Rate**\n\n" + "\n".join(
+                    f"- {equipment}: {per_day:.3f}/day"
+                    for equipment, per_day in high_utilization.itertuples(index=False, name=None)
+                ))
             
             with col3:
-                # FIXED: Convert to datetime first
-                equipment_analytics['Last Used Date'] = pd.to_datetime(equipment_analytics['Last Used'])
-                recent = equipment_analytics.nlargest(3, 'Last Used Date')[['Equipment', 'Last Used']]
-                st.markdown("**Most Recently Used**")
-                for idx, row in recent.iterrows():
-                    st.write(f"• {row['Equipment']}: {row['Last Used']}")
+                recent = equipment_analytics.nlargest(3, 'Last Used')
+                st.markdown("**Most Recently Used**\n\n" + "\n".join(
+                    f"- {equipment}: {last_used}"
+                    for equipment, last_used in zip(recent['Equipment'], recent['Last Used'].dt.strftime('%Y-%m-%d'))
+                ))
             
             st.markdown("---")
             
@@ -3122,6 +3326,7 @@ elif page == "🔧 Equipment Analytics":
             if len(equipment_analytics) >= 5:
                 st.markdown("### ⚠️ Underutilized Equipment")
                 underutilized = equipment_analytics.nsmallest(5, 'Usage Count')[['Equipment', 'Usage Count', 'Last Used']]
+                underutilized = underutilized.assign(**{'Last Used': underutilized['Last Used'].dt.strftime('%Y-%m-%d')})
                 
                 st.dataframe(
                     underutilized,
@@ -3135,79 +3340,59 @@ elif page == "🔧 Equipment Analytics":
             st.markdown("### 📅 Equipment Utilization Trends")
             
             # Timeline visualization for top equipment
-            top_equipment = equipment_analytics.head(5)['Equipment'].tolist()
+            top_equipment = top5['Equipment'].tolist()
             
             timeline_data = []
             for equipment in top_equipment:
-                for date in equipment_dates[equipment]:
+                for use_date in equipment_dates[equipment]:
                     timeline_data.append({
                         'Equipment': equipment,
-                        'Date': date,
+                        'Date': use_date,
                         'Count': 1
                     })
             
             if timeline_data:
                 timeline_df = pd.DataFrame(timeline_data)
                 
-                # Aggregate by date
-                timeline_agg = timeline_df.groupby(['Date', 'Equipment']).sum().reset_index()
+                # Aggregate by date without a key sort - first-seen order keeps each equipment's dates newest-first (get_activities orders by date DESC), so every line is still drawn monotonically
+                timeline_agg = timeline_df.groupby(['Date', 'Equipment'], sort=False, observed=True).sum().reset_index()
                 
                 st.markdown("#### Usage Over Time (Top 5 Equipment)")
-                fig = px.line(
-                    timeline_agg,
-                    x='Date',
-                    y='Count',
-                    color='Equipment',
-                    markers=True,
-                    labels={'Count': 'Times Used', 'Date': 'Date', 'Equipment': 'Equipment'}
-                )
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(equipment_timeline_fig(timeline_agg), use_container_width=True)
                 
                 # Monthly heatmap
                 st.markdown("---")
                 st.markdown("#### Monthly Usage Heatmap")
                 
                 timeline_df['Month'] = pd.to_datetime(timeline_df['Date']).dt.strftime('%Y-%m')
-                monthly = timeline_df.groupby(['Month', 'Equipment']).size().reset_index(name='Uses')
                 
-                pivot_monthly = monthly.pivot_table(
-                    index='Equipment',
-                    columns='Month',
-                    values='Uses',
-                    fill_value=0
-                )
+                # Small, bounded grid (top 5 equipment x months) - scatter counts straight into a matrix
+                eq_codes, eq_unique = pd.factorize(timeline_df['Equipment'], sort=True)
+                month_codes, month_unique = pd.factorize(timeline_df['Month'], sort=True)
+                heat = np.zeros((eq_unique.size, month_unique.size), dtype=np.int64)
+                np.add.at(heat, (eq_codes, month_codes), 1)
                 
-                fig = px.imshow(
-                    pivot_monthly,
-                    labels=dict(x="Month", y="Equipment", color="Uses"),
-                    color_continuous_scale=['white', '#F8B400', '#000000'],
-                    aspect="auto"
+                pivot_monthly = pd.DataFrame(
+                    heat,
+                    index=pd.Index(eq_unique, name='Equipment'),
+                    columns=pd.Index(month_unique, name='Month')
                 )
-                fig.update_layout(height=500)
-                st.plotly_chart(fig, use_container_width=True)
+                
+                st.plotly_chart(equipment_heatmap_fig(pivot_monthly), use_container_width=True)
                 
                 # Day of week analysis
                 st.markdown("---")
                 st.markdown("#### Usage by Day of Week")
                 
-                timeline_df['DayOfWeek'] = pd.to_datetime(timeline_df['Date']).dt.day_name()
                 day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+                timeline_df['DayOfWeek'] = pd.Categorical(
+                    pd.to_datetime(timeline_df['Date']).dt.day_name(), categories=day_order, ordered=True
+                )
                 
-                dow_usage = timeline_df.groupby('DayOfWeek').size().reset_index(name='Uses')
-                dow_usage['DayOfWeek'] = pd.Categorical(dow_usage['DayOfWeek'], categories=day_order, ordered=True)
+                dow_usage = timeline_df.groupby('DayOfWeek', sort=False, observed=True).size().reset_index(name='Uses')
                 dow_usage = dow_usage.sort_values('DayOfWeek')
                 
-                fig = px.bar(
-                    dow_usage,
-                    x='DayOfWeek',
-                    y='Uses',
-                    labels={'DayOfWeek': 'Day of Week', 'Uses': 'Total Uses'},
-                    color='DayOfWeek',
-                    color_discrete_sequence=['#E74C3C', '#3498DB', '#27AE60', '#F8B400', '#9B59B6', '#17A2B8', '#E67E22']
-                )
-                fig.update_layout(showlegend=False, height=300)
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(equipment_dow_fig(dow_usage), use_container_width=True)
         
         with tab4:
             st.markdown("### 📋 Complete Equipment Analytics Table")
@@ -3216,6 +3401,7 @@ elif page == "🔧 Equipment Analytics":
             display_df = equipment_analytics.copy()
             display_df['Total Hours'] = display_df['Total Hours'].round(2)
             display_df['Avg Hours/Use'] = display_df['Avg Hours/Use'].round(2)
+            display_df['Last Used'] = display_df['Last Used'].dt.strftime('%Y-%m-%d')
             
             st.dataframe(
                 display_df,
@@ -3224,10 +3410,9 @@ elif page == "🔧 Equipment Analytics":
             )
             
             # Download button
-            csv = display_df.to_csv(index=False)
             st.download_button(
                 label="📥 Download Equipment Analytics CSV",
-                data=csv,
+                data=lambda df=display_df: df_to_csv(df),
                 file_name=f"equipment_analytics_{datetime.now().strftime('%Y%m%d')}.csv",
                 mime="text/csv"
             )
@@ -3240,21 +3425,27 @@ elif page == "🔧 Equipment Analytics":
             col1, col2 = st.columns(2)
             
             with col1:
-                st.markdown("**🔧 Maintenance Priority**")
                 # Identify high-use equipment that may need maintenance attention
-                high_use = equipment_analytics.nlargest(3, 'Usage Count')
-                for idx, row in high_use.iterrows():
-                    days_since_last = (today - pd.to_datetime(row['Last Used']).date()).days
-                    st.write(f"• **{row['Equipment']}**: {int(row['Usage Count'])} uses, last used {days_since_last} days ago")
+                high_use = top5.head(3)
+                high_use = high_use.assign(
+                    DaysSince=(pd.Timestamp(today) - high_use['Last Used']).dt.days.astype('int32')
+                )
+                st.markdown("**🔧 Maintenance Priority**\n\n" + "\n".join(
+                    f"- **{equipment}**: {int(uses)} uses, last used {days_since_last} days ago"
+                    for equipment, uses, days_since_last in high_use[['Equipment', 'Usage Count', 'DaysSince']].itertuples(index=False, name=None)
+                ))
             
             with col2:
-                st.markdown("**📊 Low Utilization Items**")
                 # Identify underutilized equipment
                 if len(equipment_analytics) >= 3:
                     low_use = equipment_analytics.nsmallest(3, 'Usage Count')
-                    for idx, row in low_use.iterrows():
-                        st.write(f"• **{row['Equipment']}**: Only {int(row['Usage Count'])} uses")
+                    st.markdown("**📊 Low Utilization Items**\n\n" + "\n".join(
+                        f"- **{equipment}**: Only {int(uses)} uses"
+                        for equipment, uses in low_use[['Equipment', 'Usage Count']].itertuples(index=False, name=None)
+                    ))
                     st.info("Consider promoting training sessions for these items")
+                else:
+                    st.markdown("**📊 Low Utilization Items**")
     
     else:
         st.info("No equipment usage data available for the selected period.")
@@ -3272,11 +3463,9 @@ elif page == "📅 History":
     with col2:
         end_date = st.date_input("End Date", value=datetime.now())
     
-    activities = get_activities(start_date, end_date)
-    
-    if not activities.empty:
-        st.markdown(f"### Showing {len(activities)} activities")
-        
+    @st.fragment
+    def history_list(activities):
+        """Filters and activity list - reruns on its own so filtering skips the reload"""
         # Filter options
         col1, col2, col3 = st.columns(3)
         
@@ -3309,44 +3498,63 @@ elif page == "📅 History":
         
         st.markdown("---")
         
-        for idx, row in filtered.iterrows():
-            with st.expander(f"📅 {row['date']} - {row['activity_type']} ({row['hours']}h)"):
+        # Page the list so a rerun builds at most page_size expanders, however long the range
+        page_size = 25
+        page_count = max(1, -(-len(filtered) // page_size))
+        page_num = 1
+        if page_count > 1:
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                # Pull the widget back into range when a narrower filter leaves fewer pages
+                if st.session_state.get("history_page", 1) > page_count:
+                    st.session_state.history_page = page_count
+                page_num = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="history_page")
+            with col2:
+                st.caption(f"Page {page_num} of {page_count} - showing {page_size} activities per page")
+        
+        # Blank out missing text once so the row loop can use plain truthiness checks
+        page_rows = filtered.iloc[(page_num - 1) * page_size:page_num * page_size].fillna(
+            {'activity_type': '', 'room_number': '', 'time_start': '', 'time_end': ''}
+        )
+        
+        for row in page_rows.itertuples(index=False):
+            with st.expander(f"📅 {row.date} - {row.activity_type} ({row.hours}h)"):
                 # View mode
-                if f"edit_{row['id']}" not in st.session_state:
+                if f"edit_{row.id}" not in st.session_state:
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        st.write(f"**Activity Type:** {row['activity_type']}")
-                        st.write(f"**Hours:** {row['hours']}")
-                        st.write(f"**Students Trained:** {row['students_trained']}")
-                        st.write(f"**Personnel:** {row['personnel'] or 'N/A'}")
+                        st.write(f"**Activity Type:** {row.activity_type}")
+                        st.write(f"**Hours:** {row.hours}")
+                        st.write(f"**Students Trained:** {row.students_trained}")
+                        st.write(f"**Personnel:** {row.personnel or 'N/A'}")
                     
                     with col2:
-                        st.write(f"**Course:** {row['course'] or 'N/A'}")
-                        st.write(f"**Equipment:** {row['equipment'] or 'N/A'}")
-                        st.write(f"**Turn In:** {row['turn_in']}")
-                        st.write(f"**Received:** {row['received']}")
+                        st.write(f"**Course:** {row.course or 'N/A'}")
+                        st.write(f"**Equipment:** {row.equipment or 'N/A'}")
+                        st.write(f"**Turn In:** {row.turn_in}")
+                        st.write(f"**Received:** {row.received}")
                     
                     # Display room and time info
-                    if pd.notna(row.get('room_number')) and row['room_number']:
-                        st.write(f"**Room(s):** {row['room_number']}")
-                    if pd.notna(row.get('time_start')) and row['time_start']:
-                        time_display = f"{row['time_start']}"
-                        if pd.notna(row.get('time_end')) and row['time_end']:
-                            time_display += f" - {row['time_end']}"
+                    if row.room_number:
+                        st.write(f"**Room(s):** {row.room_number}")
+                    if row.time_start:
+                        time_display = f"{row.time_start}"
+                        if row.time_end:
+                            time_display += f" - {row.time_end}"
                         st.write(f"**Time:** {time_display}")
                     
-                    if row['notes']:
-                        st.write(f"**Notes:** {row['notes']}")
+                    if row.notes:
+                        st.write(f"**Notes:** {row.notes}")
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        if st.button("✏️ Edit", key=f"edit_btn_{row['id']}"):
-                            st.session_state[f"edit_{row['id']}"] = True
+                        if st.button("✏️ Edit", key=f"edit_btn_{row.id}"):
+                            st.session_state[f"edit_{row.id}"] = True
                             st.rerun()
                     with col2:
-                        if st.button("🗑️ Delete", key=f"del_{row['id']}"):
-                            delete_activity(row['id'])
+                        if st.button("🗑️ Delete", key=f"del_{row.id}"):
+                            delete_activity(row.id)
                             st.success("Activity deleted")
                             st.rerun()
                 
@@ -3354,15 +3562,15 @@ elif page == "📅 History":
                 else:
                     st.markdown("**✏️ Editing Activity**")
                     
-                    edit_date = st.date_input("Date", value=pd.to_datetime(row['date']).date(), key=f"edate_{row['id']}")
+                    edit_date = st.date_input("Date", value=pd.to_datetime(row.date).date(), key=f"edate_{row.id}")
                     
                     activity_types = get_activity_types()
                     available_types = activity_types['name'].tolist()
                     
                     # Parse existing activity types and validate they exist
                     existing_types = []
-                    if pd.notna(row['activity_type']) and row['activity_type']:
-                        parsed_types = [t.strip() for t in row['activity_type'].split(',')]
+                    if row.activity_type:
+                        parsed_types = [t.strip() for t in row.activity_type.split(',')]
                         # Only include types that are in the available list
                         existing_types = [t for t in parsed_types if t in available_types]
                     
@@ -3370,24 +3578,24 @@ elif page == "📅 History":
                         "Activity Type(s)",
                         available_types,
                         default=existing_types,
-                        key=f"etype_{row['id']}"
+                        key=f"etype_{row.id}"
                     )
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        edit_hours = st.number_input("Hours", min_value=0.0, max_value=24.0, step=0.25, value=float(row['hours']), key=f"ehrs_{row['id']}")
-                        edit_students = st.number_input("Students", min_value=0, step=1, value=int(row['students_trained']), key=f"estu_{row['id']}")
+                        edit_hours = st.number_input("Hours", min_value=0.0, max_value=24.0, step=0.25, value=float(row.hours), key=f"ehrs_{row.id}")
+                        edit_students = st.number_input("Students", min_value=0, step=1, value=int(row.students_trained), key=f"estu_{row.id}")
                     with col2:
-                        edit_turn_in = st.number_input("Turn In", min_value=0, step=1, value=int(row['turn_in']), key=f"etin_{row['id']}")
-                        edit_received = st.number_input("Received", min_value=0, step=1, value=int(row['received']), key=f"erec_{row['id']}")
+                        edit_turn_in = st.number_input("Turn In", min_value=0, step=1, value=int(row.turn_in), key=f"etin_{row.id}")
+                        edit_received = st.number_input("Received", min_value=0, step=1, value=int(row.received), key=f"erec_{row.id}")
                     
                     courses_df = get_courses()
                     course_list = [""] + courses_df['name'].tolist()
                     edit_course = st.selectbox(
                         "Course",
                         course_list,
-                        index=course_list.index(row['course']) if row['course'] in course_list else 0,
-                        key=f"ecrs_{row['id']}"
+                        index=course_list.index(row.course) if row.course in course_list else 0,
+                        key=f"ecrs_{row.id}"
                     )
                     
                     # Room and Time fields
@@ -3395,48 +3603,54 @@ elif page == "📅 History":
                     with col1:
                         # Parse existing rooms (may be comma-separated)
                         existing_rooms = []
-                        if pd.notna(row.get('room_number')) and row['room_number']:
-                            existing_rooms = [r.strip() for r in str(row['room_number']).split(',')]
+                        if row.room_number:
+                            existing_rooms = [r.strip() for r in str(row.room_number).split(',')]
                         edit_rooms = st.multiselect("Room(s)", ROOM_NUMBERS, 
                                                      default=existing_rooms,
-                                                     key=f"eroom_{row['id']}")
+                                                     key=f"eroom_{row.id}")
                     with col2:
-                        if pd.notna(row.get('time_start')) and row['time_start']:
-                            default_start = datetime.strptime(row['time_start'], "%H:%M").time()
+                        if row.time_start:
+                            default_start = datetime.strptime(row.time_start, "%H:%M").time()
                         else:
                             default_start = None
-                        edit_time_start = st.time_input("Start Time", value=default_start, key=f"ets_{row['id']}")
+                        edit_time_start = st.time_input("Start Time", value=default_start, key=f"ets_{row.id}")
                     with col3:
-                        if pd.notna(row.get('time_end')) and row['time_end']:
-                            default_end = datetime.strptime(row['time_end'], "%H:%M").time()
+                        if row.time_end:
+                            default_end = datetime.strptime(row.time_end, "%H:%M").time()
                         else:
                             default_end = None
-                        edit_time_end = st.time_input("End Time", value=default_end, key=f"ete_{row['id']}")
+                        edit_time_end = st.time_input("End Time", value=default_end, key=f"ete_{row.id}")
                     
-                    edit_personnel = st.text_input("Personnel (comma-separated)", value=row['personnel'] or "", key=f"eper_{row['id']}")
-                    edit_equipment = st.text_input("Equipment (comma-separated)", value=row['equipment'] or "", key=f"eeq_{row['id']}")
-                    edit_notes = st.text_area("Notes", value=row['notes'] or "", key=f"enot_{row['id']}")
+                    edit_personnel = st.text_input("Personnel (comma-separated)", value=row.personnel or "", key=f"eper_{row.id}")
+                    edit_equipment = st.text_input("Equipment (comma-separated)", value=row.equipment or "", key=f"eeq_{row.id}")
+                    edit_notes = st.text_area("Notes", value=row.notes or "", key=f"enot_{row.id}")
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        if st.button("💾 Save Changes", key=f"save_{row['id']}", type="primary"):
+                        if st.button("💾 Save Changes", key=f"save_{row.id}", type="primary"):
                             edit_time_start_str = edit_time_start.strftime("%H:%M") if edit_time_start else ""
                             edit_time_end_str = edit_time_end.strftime("%H:%M") if edit_time_end else ""
                             edit_rooms_str = ", ".join(edit_rooms) if edit_rooms else ""
                             edit_activity_types_str = ", ".join(edit_activity_types) if edit_activity_types else ""
                             
                             update_activity(
-                                row['id'], edit_date, edit_activity_types_str, edit_hours, edit_students,
+                                row.id, edit_date, edit_activity_types_str, edit_hours, edit_students,
                                 edit_personnel, edit_equipment, edit_course, edit_rooms_str,
                                 edit_time_start_str, edit_time_end_str, edit_turn_in, edit_received, edit_notes
                             )
-                            del st.session_state[f"edit_{row['id']}"]
+                            del st.session_state[f"edit_{row.id}"]
                             st.success("Activity updated!")
                             st.rerun()
                     with col2:
-                        if st.button("❌ Cancel", key=f"cancel_{row['id']}"):
-                            del st.session_state[f"edit_{row['id']}"]
+                        if st.button("❌ Cancel", key=f"cancel_{row.id}"):
+                            del st.session_state[f"edit_{row.id}"]
                             st.rerun()
+    
+    activities = get_activities(start_date, end_date)
+    
+    if not activities.empty:
+        st.markdown(f"### Showing {len(activities)} activities")
+        history_list(activities)
     else:
         st.info("No activities found for selected date range.")
 
@@ -3447,7 +3661,7 @@ elif page == "❌ Cancellations":
     st.title("❌ Course Cancellations Tracker")
     st.markdown("**Track cancelled courses due to weather, emergencies, or other reasons**")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["🚫 Cancel Existing Activity", "📝 Manual Entry", "📊 View Cancellations", "📈 Analytics"])
+    tab1, tab2, tab3, tab4 = st.tabs(["🚫 Cancel Existing Activity", "📝 Manual Entry", "📊 View Cancellations", "📈 Analytics"], key="cancel_tabs", on_change="rerun")
     
     with tab1:
         st.markdown("### Cancel a Scheduled Activity")
@@ -3498,8 +3712,7 @@ elif page == "❌ Cancellations":
                 else:
                     reschedule_date = None
                 
-                personnel = get_personnel()
-                personnel_names = sorted(personnel['name'].tolist()) if not personnel.empty else []
+                personnel_names = _sorted_personnel_names()
                 cancel_logged_by = st.selectbox("Logged By", personnel_names, key="smart_cancel_logged_by") if personnel_names else None
             
             cancel_notes = st.text_area(
@@ -3544,8 +3757,7 @@ elif page == "❌ Cancellations":
         with col1:
             cancel_date = st.date_input("Cancellation Date", value=datetime.now().date(), key="cancel_date")
             
-            courses = get_courses()
-            course_names = [""] + sorted(courses['name'].tolist()) if not courses.empty else [""]
+            course_names = [""] + _sorted_course_names()
             cancel_course = st.selectbox("Course (Optional)", course_names, key="cancel_course")
             
             cancel_time = st.time_input("Scheduled Time", key="cancel_time")
@@ -3576,8 +3788,7 @@ elif page == "❌ Cancellations":
             key="cancel_notes"
         )
         
-        personnel = get_personnel()
-        personnel_names = sorted(personnel['name'].tolist()) if not personnel.empty else []
+        personnel_names = _sorted_personnel_names()
         cancel_created_by = st.selectbox("Logged By", personnel_names, key="cancel_created_by") if personnel_names else None
         
         if st.button("💾 Log Manual Cancellation", type="primary"):
@@ -3601,159 +3812,159 @@ elif page == "❌ Cancellations":
                 st.error("Please select a reason for cancellation and who is logging this")
     
     with tab3:
-        st.markdown("### Cancellation History")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            view_start = st.date_input("From Date", value=datetime.now().date() - timedelta(days=90), key="cancel_view_start")
-        with col2:
-            view_end = st.date_input("To Date", value=datetime.now().date(), key="cancel_view_end")
-        
-        cancellations = get_cancellations(view_start, view_end)
-        
-        if not cancellations.empty:
-            # Summary metrics
-            col1, col2, col3, col4, col5 = st.columns(5)
+        if tab3.open:
+            st.markdown("### Cancellation History")
             
+            col1, col2 = st.columns(2)
             with col1:
-                st.metric("Total Cancellations", len(cancellations))
+                view_start = st.date_input("From Date", value=datetime.now().date() - timedelta(days=90), key="cancel_view_start")
             with col2:
-                st.metric("Students Impacted", int(cancellations['impacted_students'].sum()))
-            with col3:
-                rescheduled_count = cancellations['rescheduled'].sum()
-                st.metric("Rescheduled", int(rescheduled_count))
-            with col4:
-                total_hours_lost = cancellations['scheduled_duration'].sum()
-                st.metric("Hours Lost", f"{total_hours_lost:.1f}")
-            with col5:
-                total_tech_time = cancellations['tech_time_spent'].sum() if 'tech_time_spent' in cancellations.columns else 0
-                st.metric("Tech Hours", f"{total_tech_time:.1f}")
+                view_end = st.date_input("To Date", value=datetime.now().date(), key="cancel_view_end")
+            
+            @st.fragment
+            def cancellation_list(cancellations, view_start, view_end):
+                """Reason filter, table, edit/delete and export - reruns without re-querying"""
+                # Filter by reason
+                reason_filter = st.selectbox(
+                    "Filter by Reason",
+                    ["All"] + cancellations['reason'].unique().tolist(),
+                    key="cancel_reason_filter"
+                )
+                
+                if reason_filter != "All":
+                    filtered_cancellations = cancellations[cancellations['reason'] == reason_filter]
+                else:
+                    filtered_cancellations = cancellations
+                
+                # Display table with tech time
+                st.markdown(f"**Showing {len(filtered_cancellations)} cancellations**")
+                
+                columns_to_show = ['id', 'date', 'course', 'scheduled_time', 'scheduled_duration', 
+                                  'reason', 'impacted_students', 'rescheduled', 'tech_time_spent', 'created_by']
+                
+                # Only show columns that exist
+                columns_to_show = [col for col in columns_to_show if col in filtered_cancellations.columns]
+                
+                display_cancellations = filtered_cancellations[columns_to_show].assign(
+                    date=filtered_cancellations['date'].dt.strftime('%Y-%m-%d')
+                )
+                
+                if 'rescheduled' in display_cancellations.columns:
+                    display_cancellations = display_cancellations.assign(
+                        rescheduled=np.where(display_cancellations['rescheduled'].to_numpy() == 1, '✅', '❌')
+                    )
+                
+                st.dataframe(display_cancellations, use_container_width=True, height=400)
+                
+                # Edit/Delete section
+                st.markdown("---")
+                st.markdown("### Edit or Delete Cancellation")
+                
+                with st.form("edit_cancellation_form"):
+                    cancel_id_to_edit = st.number_input("Cancellation ID to Edit", min_value=1, value=1, step=1, key="cancel_id_edit")
+                    
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        if st.form_submit_button("✏️ Mark as Rescheduled", key="mark_rescheduled"):
+                            update_cancellation(cancel_id_to_edit, rescheduled=1)
+                            st.success("✅ Marked as rescheduled")
+                            st.rerun()
+                    
+                    with col2:
+                        if st.form_submit_button("🗑️ Delete Cancellation", key="delete_cancel"):
+                            delete_cancellation(cancel_id_to_edit)
+                            st.success("✅ Cancellation deleted")
+                            st.rerun()
+                
+                # CSV Export
+                st.markdown("---")
+                st.download_button(
+                    label="📥 Download Cancellations CSV",
+                    data=lambda df=filtered_cancellations: df_to_csv(df),
+                    file_name=f"cancellations_{view_start}_to_{view_end}.csv",
+                    mime="text/csv"
+                )
             
-            st.markdown("---")
+            cancellations = get_cancellations(view_start, view_end)
             
-            # Filter by reason
-            reason_filter = st.selectbox(
-                "Filter by Reason",
-                ["All"] + cancellations['reason'].unique().tolist(),
-                key="cancel_reason_filter"
-            )
+            if not cancellations.empty:
+                # Summary metrics
+                col1, col2, col3, col4, col5 = st.columns(5)
+                
+                with col1:
+                    st.metric("Total Cancellations", len(cancellations))
+                with col2:
+                    st.metric("Students Impacted", int(cancellations['impacted_students'].sum()))
+                with col3:
+                    rescheduled_count = cancellations['rescheduled'].sum()
+                    st.metric("Rescheduled", int(rescheduled_count))
+                with col4:
+                    total_hours_lost = cancellations['scheduled_duration'].sum()
+                    st.metric("Hours Lost", f"{total_hours_lost:.1f}")
+                with col5:
+                    total_tech_time = cancellations['tech_time_spent'].sum() if 'tech_time_spent' in cancellations.columns else 0
+                    st.metric("Tech Hours", f"{total_tech_time:.1f}")
+                
+                st.markdown("---")
+                
+                cancellation_list(cancellations, view_start, view_end)
             
-            if reason_filter != "All":
-                filtered_cancellations = cancellations[cancellations['reason'] == reason_filter]
             else:
-                filtered_cancellations = cancellations
-            
-            # Display table with tech time
-            st.markdown(f"**Showing {len(filtered_cancellations)} cancellations**")
-            
-            columns_to_show = ['id', 'date', 'course', 'scheduled_time', 'scheduled_duration', 
-                              'reason', 'impacted_students', 'rescheduled', 'tech_time_spent', 'created_by']
-            
-            # Only show columns that exist
-            columns_to_show = [col for col in columns_to_show if col in filtered_cancellations.columns]
-            
-            display_cancellations = filtered_cancellations[columns_to_show].copy()
-            
-            if 'rescheduled' in display_cancellations.columns:
-                display_cancellations['rescheduled'] = display_cancellations['rescheduled'].apply(lambda x: '✅' if x == 1 else '❌')
+                st.info("No cancellations recorded for this period.")
+    
+    with tab4:
+        if tab4.open:
+            st.markdown("### Cancellation Analytics")
             
-            st.dataframe(display_cancellations, use_container_width=True, height=400)
+            year_select = st.selectbox("Select Year", [2024, 2025, 2026], index=1, key="cancel_year")
             
-            # Edit/Delete section
-            st.markdown("---")
-            st.markdown("### Edit or Delete Cancellation")
+            year_start, year_end = _year_bounds(year_select)
             
-            cancel_id_to_edit = st.number_input("Cancellation ID to Edit", min_value=1, value=1, step=1, key="cancel_id_edit")
+            year_cancellations = get_cancellations(year_start, year_end)
             
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if st.button("✏️ Mark as Rescheduled", key="mark_rescheduled"):
-                    update_cancellation(cancel_id_to_edit, rescheduled=1)
-                    st.success("✅ Marked as rescheduled")
-                    st.rerun()
-            
-            with col2:
-                if st.button("🗑️ Delete Cancellation", key="delete_cancel"):
-                    delete_cancellation(cancel_id_to_edit)
-                    st.success("✅ Cancellation deleted")
-                    st.rerun()
-            
-            # CSV Export
-            st.markdown("---")
-            csv = filtered_cancellations.to_csv(index=False)
-            st.download_button(
-                label="📥 Download Cancellations CSV",
-                data=csv,
-                file_name=f"cancellations_{view_start}_to_{view_end}.csv",
-                mime="text/csv"
-            )
-        
-        else:
-            st.info("No cancellations recorded for this period.")
-    
-    with tab4:
-        st.markdown("### Cancellation Analytics")
-        
-        year_select = st.selectbox("Select Year", [2024, 2025, 2026], index=1, key="cancel_year")
-        
-        year_start = datetime(year_select, 1, 1).date()
-        year_end = datetime(year_select, 12, 31).date()
-        
-        year_cancellations = get_cancellations(year_start, year_end)
-        
-        if not year_cancellations.empty:
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Cancellations by reason
-                reason_counts = year_cancellations['reason'].value_counts()
+            if not year_cancellations.empty:
+                reason_items, monthly_values = _cancellation_year_counts(year_select)
+                col1, col2 = st.columns(2)
                 
-                fig = px.pie(
-                    values=reason_counts.values,
-                    names=reason_counts.index,
-                    title=f"Cancellations by Reason ({year_select})",
-                    color_discrete_sequence=['#F8B400', '#E74C3C', '#4A90E2', '#27AE60', '#9B59B6']
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                # Monthly trend
-                year_cancellations['month'] = pd.to_datetime(year_cancellations['date']).dt.month
-                monthly_counts = year_cancellations.groupby('month').size()
+                with col1:
+                    # Cancellations by reason
+                    st.plotly_chart(cancellation_reason_fig(reason_items, year_select), use_container_width=True)
                 
-                fig = px.bar(
-                    x=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'],
-                    y=[monthly_counts.get(i, 0) for i in range(1, 13)],
-                    title=f"Monthly Cancellation Trend ({year_select})",
-                    labels={'x': 'Month', 'y': 'Cancellations'},
-                    color_discrete_sequence=['#F8B400']
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Impact summary
-            st.markdown("---")
-            st.markdown("### Impact Summary")
-            
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.metric("Total Cancellations", len(year_cancellations))
-                st.metric("Rescheduled", int(year_cancellations['rescheduled'].sum()))
-            
-            with col2:
-                st.metric("Students Impacted", int(year_cancellations['impacted_students'].sum()))
-                st.metric("Hours Lost", f"{year_cancellations['scheduled_duration'].sum():.1f}")
-            
-            with col3:
-                reschedule_rate = (year_cancellations['rescheduled'].sum() / len(year_cancellations) * 100) if len(year_cancellations) > 0 else 0
-                st.metric("Reschedule Rate", f"{reschedule_rate:.0f}%")
+                with col2:
+                    # Monthly trend
+                    st.plotly_chart(cancellation_monthly_fig(monthly_values, year_select), use_container_width=True)
                 
-                avg_students = year_cancellations['impacted_students'].mean()
-                st.metric("Avg Students/Cancellation", f"{avg_students:.1f}")
-        
-        else:
-            st.info(f"No cancellations recorded for {year_select}.")
+                # Impact summary
+                st.markdown("---")
+                st.markdown("### Impact Summary")
+                
+                impact = year_cancellations.agg({
+                    'rescheduled': 'sum',
+                    'impacted_students': ['sum', 'mean'],
+                    'scheduled_duration': 'sum'
+                })
+                rescheduled_total = impact.at['sum', 'rescheduled']
+                
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.metric("Total Cancellations", len(year_cancellations))
+                    st.metric("Rescheduled", int(rescheduled_total))
+                
+                with col2:
+                    st.metric("Students Impacted", int(impact.at['sum', 'impacted_students']))
+                    st.metric("Hours Lost", f"{impact.at['sum', 'scheduled_duration']:.1f}")
+                
+                with col3:
+                    reschedule_rate = (rescheduled_total / len(year_cancellations) * 100) if len(year_cancellations) > 0 else 0
+                    st.metric("Reschedule Rate", f"{reschedule_rate:.0f}%")
+                    
+                    avg_students = impact.at['mean', 'impacted_students']
+                    st.metric("Avg Students/Cancellation", f"{avg_students:.1f}")
+            
+            else:
+                st.info(f"No cancellations recorded for {year_select}.")
 
 #############################################
 # PAGE 5.6: TIME OFF TRACKER (NEW!)
@@ -3762,25 +3973,23 @@ elif page == "🏖️ Time Off":
     st.title("🏖️ Team Time Off Tracker")
     st.markdown("**Monitor vacation, sick time, and PTO to ensure your team takes needed breaks**")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["📝 Log Time Off", "📊 View Records", "📈 Analytics", "💰 Leave Balances"])
+    # Active leave type names - one fetch shared by the log form, the record editor and the accrual tools
+    active_leave_types = get_leave_types(active_only=True)['leave_type_name'].tolist()
+    
+    tab1, tab2, tab3, tab4 = st.tabs(["📝 Log Time Off", "📊 View Records", "📈 Analytics", "💰 Leave Balances"], key="pto_tabs", on_change="rerun")
     
     with tab1:
         st.markdown("### Log Team Member Time Off")
         
-        personnel = get_personnel()
-        personnel_names = sorted(personnel['name'].tolist()) if not personnel.empty else []
+        personnel_names = _sorted_personnel_names()
         
         col1, col2 = st.columns(2)
         
         with col1:
             pto_person = st.selectbox("Team Member", personnel_names, key="pto_person")
-            pto_start = st.date_input("Start Date", value=datetime.now().date(), key="pto_start")
-            pto_end = st.date_input("End Date", value=datetime.now().date(), key="pto_end")
         
         with col2:
-            # Get leave types from database
-            leave_types_df = get_leave_types(active_only=True)
-            leave_type_options = leave_types_df['leave_type_name'].tolist() if not leave_types_df.empty else ["Vacation", "Sick Leave", "Personal Day"]
+            leave_type_options = active_leave_types or ["Vacation", "Sick Leave", "Personal Day"]
             
             pto_type = st.selectbox(
                 "Type of Time Off",
@@ -3792,26 +4001,37 @@ elif page == "🏖️ Time Off":
             if pto_person:
                 accruals = get_leave_accruals(pto_person)
                 if not accruals.empty:
-                    matching = accruals[accruals['leave_type'] == pto_type]
-                    if not matching.empty:
-                        available = matching.iloc[0]['hours_available']
-                        st.info(f"💡 Available: {available:.1f} hours")
+                    available_by_type = dict(zip(accruals['leave_type'], accruals['hours_available']))
+                    if pto_type in available_by_type:
+                        st.info(f"💡 Available: {available_by_type[pto_type]:.1f} hours")
                     else:
                         st.warning(f"⚠️ No accrual record for {pto_type}")
                 else:
                     st.warning(f"⚠️ No leave balances initialized for {pto_person}")
+        
+        # Dates, hours, status and notes only rerun the script on submit
+        with st.form("log_time_off_form"):
+            col1, col2 = st.columns(2)
             
-            # Calculate hours automatically
-            days_diff = (pto_end - pto_start).days + 1
-            default_hours = days_diff * 8
+            with col1:
+                pto_start = st.date_input("Start Date", value=datetime.now().date(), key="pto_start")
+                pto_end = st.date_input("End Date", value=datetime.now().date(), key="pto_end")
             
-            pto_hours = st.number_input("Hours", min_value=0.0, value=float(default_hours), step=0.5, key="pto_hours")
+            with col2:
+                pto_hours = st.number_input("Hours", min_value=0.0, value=0.0, step=0.5, key="pto_hours",
+                                            help="Leave at 0 to log 8 hours per day from start to end date")
+                
+                pto_status = st.selectbox("Status", ["Approved", "Pending", "Denied"], key="pto_status")
             
-            pto_status = st.selectbox("Status", ["Approved", "Pending", "Denied"], key="pto_status")
-        
-        pto_notes = st.text_area("Notes (Optional)", placeholder="Additional information...", key="pto_notes")
+            pto_notes = st.text_area("Notes (Optional)", placeholder="Additional information...", key="pto_notes")
+            
+            submitted = st.form_submit_button("💾 Log Time Off", type="primary")
         
-        if st.button("💾 Log Time Off", type="primary"):
+        if submitted:
+            # Calculate hours automatically
+            if pto_hours == 0:
+                pto_hours = float(((pto_end - pto_start).days + 1) * 8)
+            
             if pto_person and pto_hours > 0:
                 success, remaining = add_time_off(
                     personnel=pto_person,
@@ -3836,315 +4056,314 @@ elif page == "🏖️ Time Off":
                 st.error("Please select team member and enter hours")
     
     with tab2:
-        st.markdown("### Time Off Records")
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            view_start_pto = st.date_input("From Date", value=datetime.now().date() - timedelta(days=90), key="pto_view_start")
-        with col2:
-            view_end_pto = st.date_input("To Date", value=datetime.now().date(), key="pto_view_end")
-        with col3:
-            personnel_filter = st.selectbox("Filter by Person", ["All"] + personnel_names, key="pto_person_filter")
-        
-        if personnel_filter == "All":
-            time_off_records = get_time_off(view_start_pto, view_end_pto)
-        else:
-            time_off_records = get_time_off(view_start_pto, view_end_pto, personnel_filter)
-        
-        if not time_off_records.empty:
-            # Summary metrics
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric("Total Entries", len(time_off_records))
-            with col2:
-                st.metric("Total Hours", f"{time_off_records['hours'].sum():.1f}")
-            with col3:
-                st.metric("Total Days", f"{(time_off_records['hours'].sum() / 8):.1f}")
-            with col4:
-                unique_people = time_off_records['personnel'].nunique()
-                st.metric("Team Members", unique_people)
-            
-            st.markdown("---")
-            
-            # Display table
-            st.dataframe(time_off_records, use_container_width=True, height=400)
-            
-            # Edit/Delete section
-            st.markdown("---")
-            st.markdown("### ✏️ Edit or Delete Record")
-            
-            pto_id_to_edit = st.number_input("Record ID to Edit", min_value=1, value=1, step=1, key="pto_id_edit")
-            
-            # Get the record details for display
-            selected_record = time_off_records[time_off_records['id'] == pto_id_to_edit]
-            
-            if not selected_record.empty:
-                current_person = selected_record.iloc[0]['personnel']
-                current_leave_type = selected_record.iloc[0]['time_off_type']
-                current_hours = selected_record.iloc[0]['hours']
-                current_status = selected_record.iloc[0]['status']
-                
-                st.info(f"📋 Selected: {current_person} - {current_leave_type} - {current_hours} hours - Status: {current_status}")
+        if tab2.open:
+            st.markdown("### Time Off Records")
             
             col1, col2, col3 = st.columns(3)
-            
             with col1:
-                st.markdown("**Change Leave Type**")
-                leave_types_df = get_leave_types(active_only=True)
-                leave_type_options = leave_types_df['leave_type_name'].tolist() if not leave_types_df.empty else []
-                new_leave_type = st.selectbox("Update Leave Type To", leave_type_options, key="pto_new_leave_type")
-                
-                if st.button("✏️ Change Leave Type", type="primary"):
-                    update_time_off(pto_id_to_edit, time_off_type=new_leave_type)
-                    st.success(f"✅ Leave type changed to {new_leave_type}")
-                    st.info("💡 Balances automatically adjusted!")
-                    st.rerun()
-            
+                view_start_pto = st.date_input("From Date", value=datetime.now().date() - timedelta(days=90), key="pto_view_start")
             with col2:
-                st.markdown("**Change Status**")
-                new_status = st.selectbox("Update Status To", ["Approved", "Pending", "Denied"], key="pto_new_status")
-                if st.button("✏️ Update Status"):
-                    update_time_off(pto_id_to_edit, status=new_status)
-                    st.success("✅ Status updated")
-                    st.rerun()
-            
+                view_end_pto = st.date_input("To Date", value=datetime.now().date(), key="pto_view_end")
             with col3:
-                st.markdown("**Delete Record**")
-                st.warning("⚠️ Will restore hours to balance")
-                if st.button("🗑️ Delete Record", key="delete_pto"):
-                    delete_time_off(pto_id_to_edit)
-                    st.success("✅ Record deleted & hours restored")
-                    st.rerun()
+                personnel_filter = st.selectbox("Filter by Person", _personnel_filter_options(), key="pto_person_filter")
             
-            # CSV Export
-            st.markdown("---")
-            csv = time_off_records.to_csv(index=False)
-            st.download_button(
-                label="📥 Download Time Off CSV",
-                data=csv,
-                file_name=f"time_off_{view_start_pto}_to_{view_end_pto}.csv",
-                mime="text/csv"
-            )
-        
-        else:
-            st.info("No time off records for this period.")
-    
-    with tab3:
-        st.markdown("### Time Off Analytics")
-        
-        year_select_pto = st.selectbox("Select Year", [2024, 2025, 2026], index=1, key="pto_year")
-        
-        summary = get_time_off_summary(year_select_pto)
-        
-        if not summary.empty:
-            # Total time off by person
-            st.markdown("### Time Off by Team Member")
-            
-            person_totals = summary.groupby('personnel')['total_hours'].sum().sort_values(ascending=False)
-            
-            fig = px.bar(
-                x=person_totals.values,
-                y=person_totals.index,
-                orientation='h',
-                title=f"Total Time Off Hours ({year_select_pto})",
-                labels={'x': 'Hours', 'y': 'Team Member'},
-                color_discrete_sequence=['#F8B400']
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Time off by type
-            col1, col2 = st.columns(2)
+            if personnel_filter == "All":
+                time_off_records = get_time_off(view_start_pto, view_end_pto)
+            else:
+                time_off_records = get_time_off(view_start_pto, view_end_pto, personnel_filter)
             
-            with col1:
-                type_totals = summary.groupby('time_off_type')['total_hours'].sum()
+            if not time_off_records.empty:
+                # Summary metrics
+                col1, col2, col3, col4 = st.columns(4)
                 
-                fig = px.pie(
-                    values=type_totals.values,
-                    names=type_totals.index,
-                    title="Time Off by Type",
-                    color_discrete_sequence=['#F8B400', '#4A90E2', '#27AE60', '#E67E22', '#9B59B6']
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                # Average time off per person
-                avg_by_person = summary.groupby('personnel')['total_hours'].sum() / 8  # Convert to days
+                with col1:
+                    st.metric("Total Entries", len(time_off_records))
+                with col2:
+                    st.metric("Total Hours", f"{time_off_records['hours'].sum():.1f}")
+                with col3:
+                    st.metric("Total Days", f"{(time_off_records['hours'].sum() / 8):.1f}")
+                with col4:
+                    unique_people = time_off_records['personnel'].nunique()
+                    st.metric("Team Members", unique_people)
                 
-                st.markdown("#### Days Off per Person")
-                for person, days in avg_by_person.sort_values(ascending=False).items():
-                    st.metric(person, f"{days:.1f} days")
-            
-            # Detailed breakdown
-            st.markdown("---")
-            st.markdown("### Detailed Breakdown")
-            st.dataframe(summary, use_container_width=True)
-            
-            # Recommendations
-            st.markdown("---")
-            st.markdown("### 💡 Recommendations")
-            
-            for person in personnel_names:
-                person_data = summary[summary['personnel'] == person]
-                if not person_data.empty:
-                    total_days = person_data['total_hours'].sum() / 8
-                    if total_days < 10:  # Less than 10 days
-                        st.warning(f"⚠️ **{person}**: Only {total_days:.1f} days off this year. Encourage taking more vacation!")
-                    elif total_days > 30:
-                        st.info(f"ℹ️ **{person}**: {total_days:.1f} days off - good work-life balance!")
-                else:
-                    st.error(f"🚨 **{person}**: NO time off recorded! This is a burnout risk!")
-        
-        else:
-            st.info(f"No time off records for {year_select_pto}.")
-    
-    with tab4:
-        st.markdown("### 💰 Leave Balance Management")
-        st.info("💡 Track available leave hours for each team member by leave type")
-        
-        personnel = get_personnel()
-        personnel_names = sorted(personnel['name'].tolist()) if not personnel.empty else []
-        
-        if personnel_names:
-            selected_person = st.selectbox("Select Team Member", personnel_names, key="leave_balance_person")
-            
-            # Initialize accruals if needed
-            accruals = get_leave_accruals(selected_person)
-            if accruals.empty:
-                st.info(f"💡 No leave balances found for {selected_person}")
-                st.markdown("**Click below to create leave balance records. All types will start at 0 hours.**")
-                st.markdown("**You'll then manually add hours as needed using the 'Add/Adjust' section.**")
+                st.markdown("---")
                 
-                if st.button("🆕 Initialize Leave Balances (Start at 0)", key="init_balances", type="primary"):
-                    initialize_leave_accruals(selected_person)
-                    st.success(f"✅ Leave balances initialized for {selected_person} - All types start at 0 hours")
-                    st.info("💡 Now add hours using the section below!")
-                    st.rerun()
-            else:
-                # Display current balances
-                st.markdown(f"### Current Leave Balances for {selected_person}")
+                # Display table
+                st.dataframe(
+                    time_off_records,
+                    column_config={
+                        'start_date': st.column_config.DateColumn(format="YYYY-MM-DD"),
+                        'end_date': st.column_config.DateColumn(format="YYYY-MM-DD")
+                    },
+                    use_container_width=True,
+                    height=400
+                )
                 
-                balance_summary = get_leave_balance_summary(selected_person)
+                # Edit/Delete section
+                st.markdown("---")
+                st.markdown("### ✏️ Edit or Delete Record")
                 
-                if not balance_summary.empty:
-                    for idx, row in balance_summary.iterrows():
-                        leave_type = row['leave_type']
-                        available = row['hours_available']
-                        used = row['hours_used']
-                        default_annual = row['default_annual_hours'] if pd.notna(row['default_annual_hours']) else 0
-                        
-                        col1, col2 = st.columns([3, 1])
+                @st.fragment
+                def time_off_edit():
+                    """Record lookup and edit/delete buttons - reruns without re-querying the records"""
+                    pto_id_to_edit = st.number_input("Record ID to Edit", min_value=1, value=1, step=1, key="pto_id_edit")
+                    
+                    # Get the record details for display
+                    selected_record = get_time_off_by_id(pto_id_to_edit)
+                    
+                    if selected_record:
+                        current_person = selected_record['personnel']
+                        current_leave_type = selected_record['time_off_type']
+                        current_hours = selected_record['hours']
+                        current_status = selected_record['status']
                         
-                        with col1:
-                            st.markdown(f"**{leave_type}**")
-                            total = available + used
-                            if total > 0:
-                                percentage = (available / total) * 100
-                                st.progress(percentage / 100)
-                                st.caption(f"{available:.1f} available / {total:.1f} total ({percentage:.0f}%)")
-                            else:
-                                st.progress(0)
-                                st.caption(f"{available:.1f} available / 0.0 total")
+                        st.info(f"📋 Selected: {current_person} - {current_leave_type} - {current_hours} hours - Status: {current_status}")
+                    
+                    col1, col2, col3 = st.columns(3)
+                    
+                    with col1:
+                        st.markdown("**Change Leave Type**")
+                        new_leave_type = st.selectbox("Update Leave Type To", active_leave_types, key="pto_new_leave_type")
                         
-                        with col2:
-                            st.metric("Used", f"{used:.1f}h")
+                        if st.button("✏️ Change Leave Type", type="primary"):
+                            update_time_off(pto_id_to_edit, time_off_type=new_leave_type)
+                            st.success(f"✅ Leave type changed to {new_leave_type}")
+                            st.info("💡 Balances automatically adjusted!")
+                            st.rerun()
+                    
+                    with col2:
+                        st.markdown("**Change Status**")
+                        new_status = st.selectbox("Update Status To", ["Approved", "Pending", "Denied"], key="pto_new_status")
+                        if st.button("✏️ Update Status"):
+                            update_time_off(pto_id_to_edit, status=new_status)
+                            st.success("✅ Status updated")
+                            st.rerun()
+                    
+                    with col3:
+                        st.markdown("**Delete Record**")
+                        st.warning("⚠️ Will restore hours to balance")
+                        if st.button("🗑️ Delete Record", key="delete_pto"):
+                            delete_time_off(pto_id_to_edit)
+                            st.success("✅ Record deleted & hours restored")
+                            st.rerun()
+                
+                time_off_edit()
                 
-                # Usage summary
+                # CSV Export
                 st.markdown("---")
-                st.markdown("### Usage This Year")
+                st.download_button(
+                    label="📥 Download Time Off CSV",
+                    data=lambda df=time_off_records: df_to_csv(df),
+                    file_name=f"time_off_{view_start_pto}_to_{view_end_pto}.csv",
+                    mime="text/csv"
+                )
+            
+            else:
+                st.info("No time off records for this period.")
+    
+    with tab3:
+        if tab3.open:
+            st.markdown("### Time Off Analytics")
+            
+            year_select_pto = st.selectbox("Select Year", [2024, 2025, 2026], index=1, key="pto_year")
+            
+            summary = get_time_off_summary(year_select_pto)
+            
+            if not summary.empty:
+                # Total time off by person
+                st.markdown("### Time Off by Team Member")
+                
+                person_totals = summary.groupby('personnel')['total_hours'].sum().sort_values(ascending=False)
                 
-                total_used = balance_summary['hours_used'].sum()
-                total_days = total_used / 8
+                st.plotly_chart(time_off_person_fig(person_totals, year_select_pto), use_container_width=True)
                 
+                # Time off by type
                 col1, col2 = st.columns(2)
+                
                 with col1:
-                    st.metric("Total Hours Used", f"{total_used:.1f}")
+                    type_totals = summary.groupby('time_off_type')['total_hours'].sum()
+                    
+                    st.plotly_chart(time_off_type_fig(type_totals), use_container_width=True)
+                
                 with col2:
-                    st.metric("Total Days Off", f"{total_days:.1f}")
+                    # Average time off per person
+                    avg_by_person = person_totals / 8  # Convert to days
+                    
+                    st.markdown("#### Days Off per Person")
+                    days_df = avg_by_person.sort_values(ascending=False).rename_axis('Team Member').reset_index(name='Days')
+                    st.dataframe(
+                        days_df,
+                        column_config={'Days': st.column_config.NumberColumn(format="%.1f days")},
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                
+                # Detailed breakdown
+                st.markdown("---")
+                st.markdown("### Detailed Breakdown")
+                st.dataframe(summary, use_container_width=True)
                 
-                # Add/Adjust accrual section
+                # Recommendations
                 st.markdown("---")
-                st.markdown("### ➕ Manage Accrual Hours")
+                st.markdown("### 💡 Recommendations")
                 
-                # Tabs for Add/Adjust vs Set Exact
-                adjust_tab1, adjust_tab2 = st.tabs(["➕ Add/Subtract Hours", "🎯 Set Exact Balance"])
+                per_person_days = avg_by_person.reindex(personnel_names)
+                for person, total_days in per_person_days.items():
+                    if pd.isna(total_days):
+                        st.error(f"🚨 **{person}**: NO time off recorded! This is a burnout risk!")
+                    elif total_days < 10:  # Less than 10 days
+                        st.warning(f"⚠️ **{person}**: Only {total_days:.1f} days off this year. Encourage taking more vacation!")
+                    elif total_days > 30:
+                        st.info(f"ℹ️ **{person}**: {total_days:.1f} days off - good work-life balance!")
+            
+            else:
+                st.info(f"No time off records for {year_select_pto}.")
+    
+    with tab4:
+        if tab4.open:
+            st.markdown("### 💰 Leave Balance Management")
+            st.info("💡 Track available leave hours for each team member by leave type")
+            
+            personnel_names = _sorted_personnel_names()
+            
+            if personnel_names:
+                selected_person = st.selectbox("Select Team Member", personnel_names, key="leave_balance_person")
+                
+                # One accrual + leave type query drives the display, the empty check and both adjust tabs
+                balance_summary = get_leave_balance_summary(selected_person)
                 
-                with adjust_tab1:
-                    st.info("💡 Add or subtract hours from current balance")
+                # Initialize accruals if needed
+                if balance_summary.empty:
+                    st.info(f"💡 No leave balances found for {selected_person}")
+                    st.markdown("**Click below to create leave balance records. All types will start at 0 hours.**")
+                    st.markdown("**You'll then manually add hours as needed using the 'Add/Adjust' section.**")
                     
-                    col1, col2, col3 = st.columns(3)
+                    if st.button("🆕 Initialize Leave Balances (Start at 0)", key="init_balances", type="primary"):
+                        initialize_leave_accruals(selected_person)
+                        st.success(f"✅ Leave balances initialized for {selected_person} - All types start at 0 hours")
+                        st.info("💡 Now add hours using the section below!")
+                        st.rerun()
+                else:
+                    # Display current balances
+                    st.markdown(f"### Current Leave Balances for {selected_person}")
                     
-                    with col1:
-                        leave_types_df = get_leave_types(active_only=True)
-                        leave_type_options = leave_types_df['leave_type_name'].tolist() if not leave_types_df.empty else []
-                        adjust_leave_type = st.selectbox("Leave Type", leave_type_options, key="adjust_leave_type")
-                        
-                        # Show current balance
-                        current_accrual = balance_summary[balance_summary['leave_type'] == adjust_leave_type]
-                        if not current_accrual.empty:
-                            current_available = current_accrual.iloc[0]['hours_available']
-                            st.caption(f"Current: {current_available:.1f} hrs")
+                    total_hours = balance_summary['hours_available'] + balance_summary['hours_used']
+                    balance_display = pd.DataFrame({
+                        'Leave Type': balance_summary['leave_type'],
+                        'Available (hrs)': balance_summary['hours_available'],
+                        'Used (hrs)': balance_summary['hours_used'],
+                        'Total (hrs)': total_hours,
+                        'Available %': (balance_summary['hours_available'] / total_hours.where(total_hours > 0) * 100).fillna(0)
+                    })
+                    st.dataframe(
+                        balance_display,
+                        column_config={
+                            'Available (hrs)': st.column_config.NumberColumn(format="%.1f"),
+                            'Used (hrs)': st.column_config.NumberColumn(format="%.1f"),
+                            'Total (hrs)': st.column_config.NumberColumn(format="%.1f"),
+                            'Available %': st.column_config.ProgressColumn(format="%.0f%%", min_value=0, max_value=100)
+                        },
+                        use_container_width=True,
+                        hide_index=True
+                    )
                     
-                    with col2:
-                        adjust_hours = st.number_input("Hours to Add/Subtract", min_value=-1000.0, max_value=1000.0, value=0.0, step=8.0, key="adjust_hours", help="Positive = add, Negative = subtract")
+                    # Usage summary
+                    st.markdown("---")
+                    st.markdown("### Usage This Year")
                     
-                    with col3:
-                        st.markdown("<br>", unsafe_allow_html=True)  # Spacer
-                        if st.button("💾 Add/Subtract", key="update_accrual", type="primary"):
-                            if adjust_hours != 0:
-                                add_accrual_hours(selected_person, adjust_leave_type, adjust_hours)
-                                if adjust_hours > 0:
-                                    st.success(f"✅ Added {adjust_hours} hours to {adjust_leave_type}")
-                                else:
-                                    st.success(f"✅ Removed {abs(adjust_hours)} hours from {adjust_leave_type}")
-                                st.rerun()
-                            else:
-                                st.error("Please enter a non-zero amount")
+                    total_used = balance_summary['hours_used'].sum()
+                    total_days = total_used / 8
                     
-                    st.text_input("Reason for Adjustment", placeholder="E.g., Annual reset, Manual correction, Carryover", key="adjust_reason")
-                
-                with adjust_tab2:
-                    st.info("💡 Set exact balance amount (overwrites current balance)")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.metric("Total Hours Used", f"{total_used:.1f}")
+                    with col2:
+                        st.metric("Total Days Off", f"{total_days:.1f}")
                     
-                    col1, col2, col3 = st.columns(3)
+                    # Add/Adjust accrual section
+                    st.markdown("---")
+                    st.markdown("### ➕ Manage Accrual Hours")
                     
-                    with col1:
-                        leave_types_df2 = get_leave_types(active_only=True)
-                        leave_type_options2 = leave_types_df2['leave_type_name'].tolist() if not leave_types_df2.empty else []
-                        set_leave_type = st.selectbox("Leave Type", leave_type_options2, key="set_leave_type")
+                    available_by_type = dict(zip(balance_summary['leave_type'], balance_summary['hours_available']))
+                    leave_type_options = active_leave_types
+                    
+                    @st.fragment
+                    def accrual_adjust(selected_person, available_by_type, leave_type_options):
+                        """Add/subtract and set-exact tabs - picking a leave type reruns only this section"""
+                        # Tabs for Add/Adjust vs Set Exact
+                        adjust_tab1, adjust_tab2 = st.tabs(["➕ Add/Subtract Hours", "🎯 Set Exact Balance"])
                         
-                        # Show current balance
-                        current_accrual2 = balance_summary[balance_summary['leave_type'] == set_leave_type]
-                        if not current_accrual2.empty:
-                            current_available2 = current_accrual2.iloc[0]['hours_available']
-                            st.caption(f"Current: {current_available2:.1f} hrs")
+                        with adjust_tab1:
+                            st.info("💡 Add or subtract hours from current balance")
+                            
+                            col1, col2 = st.columns([1, 2])
+                            
+                            with col1:
+                                adjust_leave_type = st.selectbox("Leave Type", leave_type_options, key="adjust_leave_type")
+                                
+                                # Show current balance
+                                if adjust_leave_type in available_by_type:
+                                    st.caption(f"Current: {available_by_type[adjust_leave_type]:.1f} hrs")
+                            
+                            with col2:
+                                with st.form("adjust_accrual_form"):
+                                    adjust_hours = st.number_input("Hours to Add/Subtract", min_value=-1000.0, max_value=1000.0, value=0.0, step=8.0, key="adjust_hours", help="Positive = add, Negative = subtract")
+                                    st.text_input("Reason for Adjustment", placeholder="E.g., Annual reset, Manual correction, Carryover", key="adjust_reason")
+                                    
+                                    if st.form_submit_button("💾 Add/Subtract", key="update_accrual", type="primary"):
+                                        if adjust_hours != 0:
+                                            add_accrual_hours(selected_person, adjust_leave_type, adjust_hours)
+                                            if adjust_hours > 0:
+                                                st.success(f"✅ Added {adjust_hours} hours to {adjust_leave_type}")
+                                            else:
+                                                st.success(f"✅ Removed {abs(adjust_hours)} hours from {adjust_leave_type}")
+                                            st.rerun()
+                                        else:
+                                            st.error("Please enter a non-zero amount")
+                        
+                        with adjust_tab2:
+                            st.info("💡 Set exact balance amount (overwrites current balance)")
+                            
+                            col1, col2 = st.columns([1, 2])
+                            
+                            with col1:
+                                set_leave_type = st.selectbox("Leave Type", leave_type_options, key="set_leave_type")
+                                
+                                # Show current balance
+                                if set_leave_type in available_by_type:
+                                    st.caption(f"Current: {available_by_type[set_leave_type]:.1f} hrs")
+                            
+                            with col2:
+                                with st.form("set_accrual_form"):
+                                    exact_hours = st.number_input("Set Balance To (Exact Hours)", min_value=0.0, max_value=5000.0, value=0.0, step=8.0, key="exact_hours", help="New total balance")
+                                    st.text_input("Reason for Change", placeholder="E.g., Correcting allocation, New policy, Carryover adjustment", key="set_reason")
+                                    
+                                    if st.form_submit_button("🎯 Set Exact Balance", key="set_exact_balance", type="primary"):
+                                        set_accrual_balance(selected_person, set_leave_type, exact_hours)
+                                        st.success(f"✅ {set_leave_type} balance set to {exact_hours} hours")
+                                        st.rerun()
                     
-                    with col2:
-                        exact_hours = st.number_input("Set Balance To (Exact Hours)", min_value=0.0, max_value=5000.0, value=0.0, step=8.0, key="exact_hours", help="New total balance")
+                    accrual_adjust(selected_person, available_by_type, leave_type_options)
                     
-                    with col3:
-                        st.markdown("<br>", unsafe_allow_html=True)  # Spacer
-                        if st.button("🎯 Set Exact Balance", key="set_exact_balance", type="primary"):
-                            set_accrual_balance(selected_person, set_leave_type, exact_hours)
-                            st.success(f"✅ {set_leave_type} balance set to {exact_hours} hours")
-                            st.rerun()
+                    # Recent activity
+                    st.markdown("---")
+                    st.markdown("### 📅 Recent Time Off Activity")
                     
-                    st.text_input("Reason for Change", placeholder="E.g., Correcting allocation, New policy, Carryover adjustment", key="set_reason")
-                
-                # Recent activity
-                st.markdown("---")
-                st.markdown("### 📅 Recent Time Off Activity")
-                
-                recent_pto = get_time_off(personnel=selected_person)
-                if not recent_pto.empty:
-                    recent_pto = recent_pto.sort_values('start_date', ascending=False).head(10)
-                    display_pto = recent_pto[['start_date', 'time_off_type', 'hours', 'status', 'notes']].copy()
-                    display_pto.columns = ['Date', 'Type', 'Hours', 'Status', 'Notes']
-                    st.dataframe(display_pto, use_container_width=True, height=300)
-                else:
-                    st.info("No time off records found")
-        else:
-            st.info("No personnel found. Add team members in Data Entry first.")
+                    recent_pto = get_time_off(personnel=selected_person)
+                    if not recent_pto.empty:
+                        recent_pto = recent_pto.sort_values('start_date', ascending=False).head(10)
+                        display_pto = recent_pto[['start_date', 'time_off_type', 'hours', 'status', 'notes']].copy()
+                        display_pto.columns = ['Date', 'Type', 'Hours', 'Status', 'Notes']
+                        st.dataframe(
+                            display_pto,
+                            column_config={'Date': st.column_config.DateColumn(format="YYYY-MM-DD")},
+                            use_container_width=True,
+                            height=300
+                        )
+                    else:
+                        st.info("No time off records found")
+            else:
+                st.info("No personnel found. Add team members in Data Entry first.")
 
 #############################################
 # PAGE 6: EQUIPMENT STATUS
@@ -4172,12 +4391,12 @@ elif page == "🛠️ Equipment":
         
         st.markdown("---")
         
-        for idx, row in equipment_df.iterrows():
-            status_icon = {"Operational": "✅", "Maintenance": "🔧", "Down": "❌"}
-            with st.expander(f"{status_icon.get(row['status'], '⚪')} {row['name']} - {row['status']}"):
-                st.write(f"**Status:** {row['status']}")
-                st.write(f"**Last Maintenance:** {row['last_maintenance'] or 'N/A'}")
-                st.write(f"**Notes:** {row['notes'] or 'None'}")
+        status_icon = {"Operational": "✅", "Maintenance": "🔧", "Down": "❌"}
+        for row in equipment_df.itertuples(index=False):
+            with st.expander(f"{status_icon.get(row.status, '⚪')} {row.name} - {row.status}"):
+                st.write(f"**Status:** {row.status}")
+                st.write(f"**Last Maintenance:** {row.last_maintenance or 'N/A'}")
+                st.write(f"**Notes:** {row.notes or 'None'}")
     else:
         st.info("No equipment in system. Add equipment in Settings.")
 
@@ -4190,8 +4409,11 @@ elif page == "⚠️ Incidents":
     tab1, tab2 = st.tabs(["📋 View Incidents", "🚨 Log New Incident"])
     
     with tab1:
-        active = get_incidents(resolved=0)
-        resolved_inc = get_incidents(resolved=1)
+        incidents = get_incidents()
+        # One query, partitioned once into open (0) and resolved (1) incidents
+        parts = dict(tuple(incidents.groupby('resolved')))
+        active = parts.get(0, incidents.iloc[:0])
+        resolved_inc = parts.get(1, incidents.iloc[:0])
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -4207,50 +4429,61 @@ elif page == "⚠️ Incidents":
         
         if not active.empty:
             st.markdown("### 🔴 Active Incidents")
-            for idx, row in active.iterrows():
-                severity_icon = {'Critical': '🔴', 'High': '🟠', 'Medium': '🟡', 'Low': '🟢'}
-                with st.expander(f"{severity_icon.get(row['severity'], '⚪')} {row['incident_type']} - {row['date']}"):
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.write(f"**Type:** {row['incident_type']}")
-                        st.write(f"**Severity:** {row['severity']}")
-                        st.write(f"**Equipment:** {row['equipment'] or 'N/A'}")
-                        st.write(f"**Description:** {row['description']}")
-                    with col2:
-                        resolution = st.text_area("Resolution", key=f"res_{row['id']}")
-                        if st.button("✅ Resolve Incident", key=f"r_{row['id']}", type="primary"):
-                            if resolution:
-                                resolve_incident(row['id'], resolution)
-                                st.success("Incident resolved!")
-                                st.rerun()
-                            else:
-                                st.error("Please enter resolution details")
+            severity_icon = {'Critical': '🔴', 'High': '🟠', 'Medium': '🟡', 'Low': '🟢'}
+            incident_labels = {}
+            for row in active.itertuples(index=False):
+                label = f"{severity_icon.get(row.severity, '⚪')} {row.incident_type} - {row.date}"
+                incident_labels[row.id] = label
+                with st.expander(label):
+                    st.write(f"**Type:** {row.incident_type}")
+                    st.write(f"**Severity:** {row.severity}")
+                    st.write(f"**Equipment:** {row.equipment or 'N/A'}")
+                    st.write(f"**Description:** {row.description}")
+            
+            # One resolve form for all open incidents instead of a text area + button per incident
+            with st.form("resolve_incident_form"):
+                st.markdown("#### ✅ Resolve Incident")
+                incident_id = st.selectbox("Incident", list(incident_labels), format_func=incident_labels.get)
+                resolution = st.text_area("Resolution")
+                
+                resolve_submitted = st.form_submit_button("✅ Resolve Incident", type="primary")
+            
+            if resolve_submitted:
+                if resolution:
+                    resolve_incidents([(incident_id, resolution)])
+                    st.success("Incident resolved!")
+                    st.rerun()
+                else:
+                    st.error("Please enter resolution details")
         else:
             st.success("🎉 No active incidents!")
         
         if not resolved_inc.empty:
             st.markdown("---")
             st.markdown("### ✅ Recently Resolved")
-            for idx, row in resolved_inc.head(5).iterrows():
-                with st.expander(f"✅ {row['incident_type']} - {row['date']}"):
-                    st.write(f"**Resolution:** {row['resolution']}")
+            for row in resolved_inc.head(5).itertuples(index=False):
+                with st.expander(f"✅ {row.incident_type} - {row.date}"):
+                    st.write(f"**Resolution:** {row.resolution}")
     
     with tab2:
         st.markdown("### Log New Incident")
         
-        equipment_list = [""] + get_equipment()['name'].tolist()
+        equipment_list = _equipment_options()
         
-        col1, col2 = st.columns(2)
-        with col1:
-            inc_date = st.date_input("Date", value=datetime.now())
-            inc_type = st.selectbox("Incident Type", ["Equipment Failure", "Software Issue", "Network Problem",
-                                             "Safety Concern", "Training Disruption", "Facility Issue", "Other"])
-            inc_equipment = st.selectbox("Equipment (optional)", equipment_list)
-        with col2:
-            inc_severity = st.selectbox("Severity", ["Critical", "High", "Medium", "Low"])
-            inc_description = st.text_area("Description *")
+        with st.form("log_incident_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                inc_date = st.date_input("Date", value=datetime.now())
+                inc_type = st.selectbox("Incident Type", ["Equipment Failure", "Software Issue", "Network Problem",
+                                                 "Safety Concern", "Training Disruption", "Facility Issue", "Other"])
+                inc_equipment = st.selectbox("Equipment (optional)", equipment_list)
+            with col2:
+                inc_severity = st.selectbox("Severity", ["Critical", "High", "Medium", "Low"])
+                inc_description = st.text_area("Description *")
+            
+            submitted = st.form_submit_button("🚨 Log Incident", type="primary", use_container_width=True)
         
-        if st.button("🚨 Log Incident", type="primary", use_container_width=True):
+        if submitted:
             if inc_description:
                 add_incident(inc_date, inc_type, inc_equipment, inc_severity, inc_description)
                 st.error(f"⚠️ Incident logged: {inc_type}")
@@ -4270,34 +4503,43 @@ elif page == "🎯 Goals":
         goals_df = get_goals()
         
         if not goals_df.empty:
-            for idx, row in goals_df.iterrows():
-                progress = (row['current_value'] / row['target_value'] * 100) if row['target_value'] > 0 else 0
-                
+            for row in goals_df.itertuples(index=False):
                 col1, col2 = st.columns([4, 1])
                 with col1:
-                    st.markdown(f"#### {row['goal_type']} ({row['period']})")
+                    st.markdown(f"#### {row.goal_type} ({row.period})")
                 with col2:
-                    if st.button("🗑️", key=f"delg_{row['id']}"):
-                        delete_goal(row['id'])
+                    if st.button("🗑️", key=f"delg_{row.id}"):
+                        delete_goal(row.id)
                         st.rerun()
                 
                 col1, col2, col3 = st.columns([3, 1, 1])
                 with col1:
-                    st.progress(min(progress / 100, 1.0))
+                    st.progress(min(row.progress / 100, 1.0))
                 with col2:
-                    st.metric("Progress", f"{progress:.0f}%")
+                    st.metric("Progress", f"{row.progress:.0f}%")
                 with col3:
-                    st.metric("Target", f"{row['target_value']:.0f}")
-                
-                with st.expander("Update Progress"):
-                    new_val = st.number_input("Current Value", min_value=0.0,
-                                             value=float(row['current_value']), key=f"g_{row['id']}")
-                    if st.button("💾 Update", key=f"ug_{row['id']}"):
-                        update_goal_progress(row['id'], new_val)
-                        st.success("Updated!")
-                        st.rerun()
+                    st.metric("Target", f"{row.target_value:.0f}")
                 
                 st.markdown("---")
+            
+            # One editable grid for every goal's current value instead of an input + button per goal
+            st.markdown("### Update Progress")
+            original = goals_df.set_index('id')[['goal_type', 'period', 'target_value', 'current_value']]
+            edited = st.data_editor(original, key="goals_editor", column_config={
+                'goal_type': st.column_config.TextColumn("Goal"),
+                'period': st.column_config.TextColumn("Period"),
+                'target_value': st.column_config.NumberColumn("Target", min_value=0.0),
+                'current_value': st.column_config.NumberColumn("Current Value", min_value=0.0, required=True)
+            }, disabled=['goal_type', 'period', 'target_value'], hide_index=True, use_container_width=True)
+            new_values, old_values = edited['current_value'], original['current_value']
+            changed = edited[~(new_values.eq(old_values) | (new_values.isna() & old_values.isna()))]
+            
+            if st.button("💾 Update Progress", type="primary", disabled=changed.empty):
+                bulk_apply([("UPDATE goals SET current_value = ? WHERE id = ?", (float(value), goal_id))
+                            for goal_id, value in changed['current_value'].items()])
+                del st.session_state["goals_editor"]
+                st.success(f"✅ Updated {len(changed)} goal(s)")
+                st.rerun()
         else:
             st.info("No goals set yet. Use the 'Set New Goal' tab to add your first goal!")
     
@@ -4325,392 +4567,288 @@ elif page == "🎯 Goals":
 elif page == "⚙️ Settings":
     st.title("⚙️ System Settings")
     
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["👥 Personnel", "📚 Courses", "🛠️ Equipment", "📋 Activity Types", "🏷️ Leave Types", "🏢 Room Numbers"])
-    
-    with tab1:
-        st.markdown("### Personnel Management")
-        
-        col1, col2 = st.columns(2)
+    @st.fragment
+    def settings_editor(df, table, columns, key, column_config, disabled=()):
+        """Editable grid for one settings table - edits rerun only this grid until saved in one transaction"""
+        original = df.set_index('id')[columns].astype({'active': bool})
+        edited = st.data_editor(original, key=key, column_config=column_config, disabled=list(disabled),
+                                hide_index=True, use_container_width=True)
+        unchanged = (edited == original) | (edited.isna() & original.isna())
+        changed = edited[~unchanged.all(axis=1)]
         
+        col1, col2 = st.columns([1, 3])
         with col1:
-            st.markdown("#### Add New Personnel")
-            new_name = st.text_input("Name *")
-            new_role = st.text_input("Role")
-            
-            if st.button("➕ Add Personnel", type="primary"):
-                if new_name:
-                    if add_personnel(new_name, new_role):
-                        st.success(f"✅ Added {new_name}")
-                        st.rerun()
-                    else:
-                        st.error("Person already exists")
-                else:
-                    st.error("Name required")
-        
+            save = st.button("💾 Save Changes", key=f"{key}_save", type="primary",
+                             disabled=changed.empty, use_container_width=True)
         with col2:
-            st.markdown("#### Quick Stats")
-            personnel_df = get_personnel(active_only=False)
-            active_personnel = len(personnel_df[personnel_df['active'] == 1])
-            inactive_personnel = len(personnel_df[personnel_df['active'] == 0])
-            st.metric("Active", active_personnel)
-            st.metric("Inactive", inactive_personnel)
-        
-        st.markdown("---")
-        st.markdown("#### Current Personnel")
-        
-        personnel_df = get_personnel(active_only=False)
-        
-        if not personnel_df.empty:
-            for idx, row in personnel_df.iterrows():
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    status = "✅" if row['active'] else "❌"
-                    st.write(f"{status} **{row['name']}** - {row['role'] or 'No role assigned'}")
-                with col2:
-                    if row['active']:
-                        if st.button("Deactivate", key=f"deact_p_{row['id']}"):
-                            toggle_personnel(row['id'], 0)
-                            st.rerun()
-                    else:
-                        if st.button("Activate", key=f"act_p_{row['id']}"):
-                            toggle_personnel(row['id'], 1)
-                            st.rerun()
+            if not changed.empty:
+                st.caption(f"{len(changed)} edited row(s) pending")
+        
+        if save:
+            sql = f"UPDATE {table} SET {', '.join(f'{col} = ?' for col in columns)} WHERE id = ?"
+            rows = changed.reset_index()[columns + ['id']].astype(object).itertuples(index=False, name=None)
+            if bulk_apply([(sql, row) for row in rows]):
+                del st.session_state[key]
+                st.rerun()
+            else:
+                st.error("Names must be unique - no changes were saved")
     
-    with tab2:
-        st.markdown("### Course Management")
-        
-        # Add new course section
-        st.markdown("#### Add New Course")
-        with st.form("add_course_form"):
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["👥 Personnel", "📚 Courses", "🛠️ Equipment", "📋 Activity Types", "🏷️ Leave Types", "🏢 Room Numbers"], key="settings_tabs", on_change="rerun")
+    
+    with tab1:
+        if tab1.open:
+            st.markdown("### Personnel Management")
+            
             col1, col2 = st.columns(2)
             
             with col1:
-                new_course = st.text_input("Course Name *")
+                st.markdown("#### Add New Personnel")
+                new_name = st.text_input("Name *")
+                new_role = st.text_input("Role")
+                
+                if st.button("➕ Add Personnel", type="primary"):
+                    if new_name:
+                        if add_personnel(new_name, new_role):
+                            st.success(f"✅ Added {new_name}")
+                            st.rerun()
+                        else:
+                            st.error("Person already exists")
+                    else:
+                        st.error("Name required")
+            
             with col2:
-                new_description = st.text_area("Description")
+                st.markdown("#### Quick Stats")
+                personnel_counts = get_active_counts("personnel")
+                active_personnel = personnel_counts.get(1, 0)
+                inactive_personnel = personnel_counts.get(0, 0)
+                st.metric("Active", active_personnel)
+                st.metric("Inactive", inactive_personnel)
             
-            submitted = st.form_submit_button("➕ Add Course", type="primary")
-            if submitted:
-                if new_course:
-                    if add_course(new_course, new_description):
-                        st.success(f"✅ Added {new_course}")
-                        st.rerun()
-                    else:
-                        st.error("Course already exists")
-                else:
-                    st.error("Course name required")
-        
-        st.markdown("---")
-        
-        # Display and edit existing courses
-        st.markdown("#### Current Courses")
-        
-        courses_df = get_courses(active_only=False)
+            st.markdown("---")
+            st.markdown("#### Current Personnel")
+            
+            personnel_df = get_personnel(active_only=False)
+            
+            if not personnel_df.empty:
+                settings_editor(personnel_df, "personnel", ['name', 'role', 'active'], "personnel_editor", {
+                    "name": st.column_config.TextColumn("Name"),
+                    "role": st.column_config.TextColumn("Role"),
+                    "active": st.column_config.CheckboxColumn("Active"),
+                }, disabled=['name'])
         
-        if not courses_df.empty:
-            for idx, row in courses_df.iterrows():
-                status = "✅" if row['active'] else "❌"
+    with tab2:
+        if tab2.open:
+            st.markdown("### Course Management")
+            
+            # Add new course section
+            st.markdown("#### Add New Course")
+            with st.form("add_course_form"):
+                col1, col2 = st.columns(2)
                 
-                with st.expander(f"{status} **{row['name']}**"):
-                    # Edit mode
-                    if f"edit_course_{row['id']}" in st.session_state:
-                        st.markdown("**✏️ Editing Course**")
-                        
-                        edit_name = st.text_input("Course Name", value=row['name'], key=f"cn_{row['id']}")
-                        edit_desc = st.text_area("Description", value=row['description'] or "", key=f"cd_{row['id']}")
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            if st.button("💾 Save Changes", key=f"csave_{row['id']}", type="primary"):
-                                update_course(row['id'], edit_name, edit_desc)
-                                del st.session_state[f"edit_course_{row['id']}"]
-                                st.success("Course updated!")
-                                st.rerun()
-                        with col2:
-                            if st.button("❌ Cancel", key=f"ccancel_{row['id']}"):
-                                del st.session_state[f"edit_course_{row['id']}"]
-                                st.rerun()
-                    
-                    # View mode
-                    else:
-                        if pd.notna(row.get('description')) and row.get('description'):
-                            st.write(f"**Description:** {row['description']}")
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            if st.button("✏️ Edit", key=f"cedit_btn_{row['id']}"):
-                                st.session_state[f"edit_course_{row['id']}"] = True
-                                st.rerun()
-                        with col2:
-                            if row['active']:
-                                if st.button("Deactivate", key=f"deact_c_{row['id']}"):
-                                    toggle_course(row['id'], 0)
-                                    st.rerun()
-                            else:
-                                if st.button("Activate", key=f"act_c_{row['id']}"):
-                                    toggle_course(row['id'], 1)
-                                    st.rerun()
-        else:
-            st.info("No courses yet. Add your first course above!")
-    
-    with tab3:
-        st.markdown("### Equipment Management")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("#### Add New Equipment")
-            new_equipment = st.text_input("Equipment Name *")
-            new_status = st.selectbox("Initial Status", ["Operational", "Maintenance", "Down"])
-            new_notes = st.text_area("Notes")
-            
-            if st.button("➕ Add Equipment", type="primary"):
-                if new_equipment:
-                    if add_equipment(new_equipment, new_status, new_notes):
-                        st.success(f"✅ Added {new_equipment}")
-                        st.rerun()
-                    else:
-                        st.error("Equipment already exists")
-                else:
-                    st.error("Name required")
-        
-        with col2:
-            st.markdown("#### Quick Stats")
-            equipment_df = get_equipment(active_only=False)
-            active_equipment = len(equipment_df[equipment_df['active'] == 1])
-            inactive_equipment = len(equipment_df[equipment_df['active'] == 0])
-            st.metric("Active", active_equipment)
-            st.metric("Inactive", inactive_equipment)
-        
-        st.markdown("---")
-        st.markdown("#### Current Equipment")
-        
-        equipment_df = get_equipment(active_only=False)
-        
-        if not equipment_df.empty:
-            for idx, row in equipment_df.iterrows():
-                col1, col2 = st.columns([4, 1])
                 with col1:
-                    status = "✅" if row['active'] else "❌"
-                    st.write(f"{status} **{row['name']}** - {row['status']}")
+                    new_course = st.text_input("Course Name *")
                 with col2:
-                    if row['active']:
-                        if st.button("Deactivate", key=f"deact_e_{row['id']}"):
-                            toggle_equipment(row['id'], 0)
+                    new_description = st.text_area("Description")
+                
+                submitted = st.form_submit_button("➕ Add Course", type="primary")
+                if submitted:
+                    if new_course:
+                        if add_course(new_course, new_description):
+                            st.success(f"✅ Added {new_course}")
                             st.rerun()
+                        else:
+                            st.error("Course already exists")
                     else:
-                        if st.button("Activate", key=f"act_e_{row['id']}"):
-                            toggle_equipment(row['id'], 1)
-                            st.rerun()
-    
-    with tab4:
-        st.markdown("### Activity Type Management")
+                        st.error("Course name required")
+            
+            st.markdown("---")
+            
+            # Display and edit existing courses
+            st.markdown("#### Current Courses")
+            
+            courses_df = get_courses(active_only=False)
+            
+            if not courses_df.empty:
+                settings_editor(courses_df, "courses", ['name', 'description', 'active'], "courses_editor", {
+                    "name": st.column_config.TextColumn("Course Name", required=True, validate=r"\S"),
+                    "description": st.column_config.TextColumn("Description"),
+                    "active": st.column_config.CheckboxColumn("Active"),
+                })
+            else:
+                st.info("No courses yet. Add your first course above!")
         
-        # Add new activity type
-        st.markdown("#### Add New Activity Type")
-        with st.form("add_activity_type_form"):
+    with tab3:
+        if tab3.open:
+            st.markdown("### Equipment Management")
+            
             col1, col2 = st.columns(2)
-            with col1:
-                new_activity = st.text_input("Activity Type Name *")
-            with col2:
-                new_activity_desc = st.text_input("Description")
             
-            submitted = st.form_submit_button("➕ Add Activity Type", type="primary")
-            if submitted:
-                if new_activity:
-                    if add_activity_type(new_activity, new_activity_desc):
-                        st.success(f"✅ Added {new_activity}")
-                        st.rerun()
-                    else:
-                        st.error("Activity type already exists")
-                else:
-                    st.error("Name required")
-        
-        st.markdown("---")
-        
-        # Display and edit activity types
-        st.markdown("#### Current Activity Types")
-        
-        types_df = get_activity_types(active_only=False)
-        
-        if not types_df.empty:
-            for idx, row in types_df.iterrows():
-                status = "✅" if row['active'] else "❌"
+            with col1:
+                st.markdown("#### Add New Equipment")
+                new_equipment = st.text_input("Equipment Name *")
+                new_status = st.selectbox("Initial Status", ["Operational", "Maintenance", "Down"])
+                new_notes = st.text_area("Notes")
                 
-                with st.expander(f"{status} **{row['name']}**"):
-                    # Edit mode
-                    if f"edit_type_{row['id']}" in st.session_state:
-                        st.markdown("**✏️ Editing Activity Type**")
-                        
-                        edit_type_name = st.text_input("Name", value=row['name'], key=f"tn_{row['id']}")
-                        edit_type_desc = st.text_input("Description", value=row['description'] or "", key=f"td_{row['id']}")
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            if st.button("💾 Save Changes", key=f"tsave_{row['id']}", type="primary"):
-                                update_activity_type(row['id'], edit_type_name, edit_type_desc)
-                                del st.session_state[f"edit_type_{row['id']}"]
-                                st.success("Activity type updated!")
-                                st.rerun()
-                        with col2:
-                            if st.button("❌ Cancel", key=f"tcancel_{row['id']}"):
-                                del st.session_state[f"edit_type_{row['id']}"]
-                                st.rerun()
-                    
-                    # View mode
+                if st.button("➕ Add Equipment", type="primary"):
+                    if new_equipment:
+                        if add_equipment(new_equipment, new_status, new_notes):
+                            st.success(f"✅ Added {new_equipment}")
+                            st.rerun()
+                        else:
+                            st.error("Equipment already exists")
                     else:
-                        if pd.notna(row.get('description')) and row.get('description'):
-                            st.write(f"**Description:** {row['description']}")
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            if st.button("✏️ Edit", key=f"tedit_btn_{row['id']}"):
-                                st.session_state[f"edit_type_{row['id']}"] = True
-                                st.rerun()
-                        with col2:
-                            if row['active']:
-                                if st.button("Deactivate", key=f"deact_at_{row['id']}"):
-                                    toggle_activity_type(row['id'], 0)
-                                    st.rerun()
-                            else:
-                                if st.button("Activate", key=f"act_at_{row['id']}"):
-                                    toggle_activity_type(row['id'], 1)
-                                    st.rerun()
-        else:
-            st.info("No activity types yet.")
-    
-    with tab5:
-        st.markdown("### 🏷️ Leave Type Management")
-        st.info("💡 Control what leave types are available for time off tracking and set default annual hours")
-        
-        # Add new leave type
-        st.markdown("#### Add New Leave Type")
-        with st.form("add_leave_type_form"):
-            col1, col2 = st.columns(2)
-            with col1:
-                new_leave = st.text_input("Leave Type Name *", placeholder="E.g., Jury Duty")
+                        st.error("Name required")
+            
             with col2:
-                new_leave_hours = st.number_input("Default Annual Hours", min_value=0.0, value=40.0, step=8.0)
+                st.markdown("#### Quick Stats")
+                equipment_counts = get_active_counts("equipment")
+                active_equipment = equipment_counts.get(1, 0)
+                inactive_equipment = equipment_counts.get(0, 0)
+                st.metric("Active", active_equipment)
+                st.metric("Inactive", inactive_equipment)
             
-            submitted = st.form_submit_button("➕ Add Leave Type", type="primary")
-            if submitted:
-                if new_leave:
-                    if add_leave_type(new_leave, new_leave_hours):
-                        st.success(f"✅ Added {new_leave}")
-                        st.rerun()
-                    else:
-                        st.error("Leave type already exists")
-                else:
-                    st.error("Name required")
-        
-        st.markdown("---")
-        
-        # Display current leave types
-        st.markdown("#### Current Leave Types")
-        
-        leave_types = get_leave_types(active_only=False)
+            st.markdown("---")
+            st.markdown("#### Current Equipment")
+            
+            equipment_df = get_equipment(active_only=False)
+            
+            if not equipment_df.empty:
+                settings_editor(equipment_df, "equipment", ['name', 'status', 'active'], "equipment_editor", {
+                    "name": st.column_config.TextColumn("Name"),
+                    "status": st.column_config.TextColumn("Status"),
+                    "active": st.column_config.CheckboxColumn("Active"),
+                }, disabled=['name', 'status'])
         
-        if not leave_types.empty:
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                st.markdown("**Active Leave Types:**")
-            with col2:
-                st.markdown("**Annual Hours**")
+    with tab4:
+        if tab4.open:
+            st.markdown("### Activity Type Management")
             
-            for idx, row in leave_types.iterrows():
-                if row['active']:
-                    col1, col2, col3 = st.columns([3, 1, 1])
-                    with col1:
-                        st.write(f"✅ **{row['leave_type_name']}**")
-                    with col2:
-                        st.write(f"{row['default_annual_hours']:.0f} hrs")
-                    with col3:
-                        if st.button("Deactivate", key=f"deact_lt_{row['id']}"):
-                            delete_leave_type(row['id'])
+            # Add new activity type
+            st.markdown("#### Add New Activity Type")
+            with st.form("add_activity_type_form"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    new_activity = st.text_input("Activity Type Name *")
+                with col2:
+                    new_activity_desc = st.text_input("Description")
+                
+                submitted = st.form_submit_button("➕ Add Activity Type", type="primary")
+                if submitted:
+                    if new_activity:
+                        if add_activity_type(new_activity, new_activity_desc):
+                            st.success(f"✅ Added {new_activity}")
                             st.rerun()
+                        else:
+                            st.error("Activity type already exists")
+                    else:
+                        st.error("Name required")
             
             st.markdown("---")
-            st.markdown("**Inactive Leave Types:**")
             
-            inactive = leave_types[leave_types['active'] == 0]
-            if not inactive.empty:
-                for idx, row in inactive.iterrows():
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.write(f"❌ {row['leave_type_name']} ({row['default_annual_hours']:.0f} hrs)")
-                    with col2:
-                        if st.button("Reactivate", key=f"react_lt_{row['id']}"):
-                            update_leave_type(row['id'], active=1)
-                            st.rerun()
+            # Display and edit activity types
+            st.markdown("#### Current Activity Types")
+            
+            types_df = get_activity_types(active_only=False)
+            
+            if not types_df.empty:
+                settings_editor(types_df, "activity_types", ['name', 'description', 'active'], "activity_types_editor", {
+                    "name": st.column_config.TextColumn("Name", required=True, validate=r"\S"),
+                    "description": st.column_config.TextColumn("Description"),
+                    "active": st.column_config.CheckboxColumn("Active"),
+                })
             else:
-                st.info("No inactive leave types")
-        else:
-            st.info("No leave types yet.")
-    
-    with tab6:
-        st.markdown("### 🏢 Room Number Management")
-        st.info("💡 Add or deactivate simulation rooms. Deactivated rooms are hidden from dropdowns but preserved in history.")
+                st.info("No activity types yet.")
         
-        # Add new room
-        st.markdown("#### Add New Room")
-        with st.form("add_room_form"):
-            col1, col2 = st.columns(2)
-            with col1:
-                new_room = st.text_input("Room Number *", placeholder="E.g., 9-220")
-            with col2:
-                new_room_notes = st.text_input("Notes (Optional)", placeholder="E.g., New sim lab")
+    with tab5:
+        if tab5.open:
+            st.markdown("### 🏷️ Leave Type Management")
+            st.info("💡 Control what leave types are available for time off tracking and set default annual hours")
             
-            submitted = st.form_submit_button("➕ Add Room", type="primary")
-            if submitted:
-                if new_room:
-                    if add_room_number(new_room, new_room_notes):
-                        st.success(f"✅ Added Room {new_room}")
-                        st.rerun()
+            # Add new leave type
+            st.markdown("#### Add New Leave Type")
+            with st.form("add_leave_type_form"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    new_leave = st.text_input("Leave Type Name *", placeholder="E.g., Jury Duty")
+                with col2:
+                    new_leave_hours = st.number_input("Default Annual Hours", min_value=0.0, value=40.0, step=8.0)
+                
+                submitted = st.form_submit_button("➕ Add Leave Type", type="primary")
+                if submitted:
+                    if new_leave:
+                        if add_leave_type(new_leave, new_leave_hours):
+                            st.success(f"✅ Added {new_leave}")
+                            st.rerun()
+                        else:
+                            st.error("Leave type already exists")
                     else:
-                        st.error("Room already exists")
-                else:
-                    st.error("Room number required")
-        
-        st.markdown("---")
-        
-        # Display rooms
-        st.markdown("#### Current Rooms")
-        
-        rooms = get_room_numbers(active_only=False)
+                        st.error("Name required")
+            
+            st.markdown("---")
+            
+            # Display current leave types
+            st.markdown("#### Current Leave Types")
+            
+            # Active rows come from the cached active_only query; inactive ones are fetched only on request
+            leave_type_counts = get_active_counts("leave_types")
+            show_inactive_leave = st.checkbox(f"Show inactive leave types ({leave_type_counts.get(0, 0)})", key="show_inactive_leave_types")
+            leave_types = get_leave_types(active_only=not show_inactive_leave)
+            
+            if not leave_types.empty:
+                editor_key = "leave_types_editor_all" if show_inactive_leave else "leave_types_editor"
+                settings_editor(leave_types, "leave_types", ['leave_type_name', 'default_annual_hours', 'active'], editor_key, {
+                    "leave_type_name": st.column_config.TextColumn("Leave Type"),
+                    "default_annual_hours": st.column_config.NumberColumn("Annual Hours", min_value=0.0, step=8.0, format="%.0f hrs"),
+                    "active": st.column_config.CheckboxColumn("Active"),
+                }, disabled=['leave_type_name'])
+            elif leave_type_counts:
+                st.info("No active leave types - show inactive ones to reactivate them.")
+            else:
+                st.info("No leave types yet.")
         
-        if not rooms.empty:
-            st.markdown("**Active Rooms:**")
+    with tab6:
+        if tab6.open:
+            st.markdown("### 🏢 Room Number Management")
+            st.info("💡 Add or deactivate simulation rooms. Deactivated rooms are hidden from dropdowns but preserved in history.")
             
-            active_rooms = rooms[rooms['active'] == 1]
-            if not active_rooms.empty:
-                for idx, row in active_rooms.iterrows():
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        notes_display = f" - {row['notes']}" if pd.notna(row['notes']) and row['notes'] else ""
-                        st.write(f"✅ **{row['room_number']}**{notes_display}")
-                    with col2:
-                        if st.button("Deactivate", key=f"deact_rm_{row['id']}"):
-                            toggle_room_active(row['id'])
+            # Add new room
+            st.markdown("#### Add New Room")
+            with st.form("add_room_form"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    new_room = st.text_input("Room Number *", placeholder="E.g., 9-220")
+                with col2:
+                    new_room_notes = st.text_input("Notes (Optional)", placeholder="E.g., New sim lab")
+                
+                submitted = st.form_submit_button("➕ Add Room", type="primary")
+                if submitted:
+                    if new_room:
+                        if add_room_number(new_room, new_room_notes):
+                            st.success(f"✅ Added Room {new_room}")
                             st.rerun()
+                        else:
+                            st.error("Room already exists")
+                    else:
+                        st.error("Room number required")
             
             st.markdown("---")
-            st.markdown("**Inactive Rooms:**")
             
-            inactive_rooms = rooms[rooms['active'] == 0]
-            if not inactive_rooms.empty:
-                for idx, row in inactive_rooms.iterrows():
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        notes_display = f" - {row['notes']}" if pd.notna(row['notes']) and row['notes'] else ""
-                        st.write(f"❌ {row['room_number']}{notes_display}")
-                    with col2:
-                        if st.button("Reactivate", key=f"react_rm_{row['id']}"):
-                            toggle_room_active(row['id'])
-                            st.rerun()
+            # Display rooms
+            st.markdown("#### Current Rooms")
+            
+            # Active rows come from the cached active_only query; inactive ones are fetched only on request
+            room_counts = get_active_counts("room_numbers")
+            show_inactive_rooms = st.checkbox(f"Show inactive rooms ({room_counts.get(0, 0)})", key="show_inactive_rooms")
+            rooms = get_room_numbers(active_only=not show_inactive_rooms)
+            
+            if not rooms.empty:
+                editor_key = "rooms_editor_all" if show_inactive_rooms else "rooms_editor"
+                settings_editor(rooms, "room_numbers", ['room_number', 'notes', 'active'], editor_key, {
+                    "room_number": st.column_config.TextColumn("Room"),
+                    "notes": st.column_config.TextColumn("Notes"),
+                    "active": st.column_config.CheckboxColumn("Active"),
+                }, disabled=['room_number'])
+            elif room_counts:
+                st.info("No active rooms - show inactive ones to reactivate them.")
             else:
-                st.info("No inactive rooms")
-        else:
-            st.info("No rooms yet.")
-
-# Initialize database
-init_db()
+                st.info("No rooms yet.")